@@ -6,11 +6,37 @@ from dotenv import load_dotenv
 from flask import jsonify
 from flask_login import login_required
 from database import init_app
+import logging_config
+import metrics
+import profiling
+import llm
+import serialization
+import caching
+import batch
+import compression
+import ratelimit
+import tasks
+import chat_history
+import retrieval
+import retention
 
 # Load environment variables
 load_dotenv()
 
-def create_app():
+SELF_CARE_TIPS = [
+    "Try 4-7-8 breathing: Inhale for 4 counts, hold for 7, exhale for 8.",
+    "Take 30 seconds to write down one thing you're grateful for today.",
+    "Stand up and stretch for 2 minutes to boost your mood and energy.",
+    "Focus on your five senses - notice 5 things you can see, 4 you can touch, 3 you can hear, 2 you can smell, and 1 you can taste.",
+    "Speak to yourself today as you would to a good friend.",
+    "Drink a glass of water - dehydration can affect your mood.",
+    "Set a small, achievable goal for today.",
+    "Listen to a song that makes you feel good.",
+    "Text someone you care about.",
+    "Spend 5 minutes in nature or looking out a window."
+]
+
+def create_app(config=None):
     app = Flask(__name__)
     
     # Configure app
@@ -19,7 +45,70 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SESSION_TYPE'] = 'filesystem'
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=1)
-    
+
+    # Logging: root level, per-logger overrides ("name=LEVEL,...") and the
+    # fraction of requests whose DEBUG records are kept
+    app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO').upper()
+    app.config['LOG_LEVELS'] = os.getenv('LOG_LEVELS', 'sqlalchemy=WARNING')
+    app.config['LOG_SAMPLE_RATE'] = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))
+
+    # Metrics: set METRICS_DIR to a directory shared by all gunicorn workers
+    # to aggregate them in /api/metrics; METRICS_TOKEN protects the endpoint
+    app.config['METRICS_DIR'] = os.getenv('METRICS_DIR')
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+
+    # Opt-in request profiling: requests carrying X-Profile-Token, or a
+    # random PROFILE_SAMPLE_RATE fraction, are profiled into PROFILE_DIR
+    app.config['PROFILING_ENABLED'] = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+    app.config['PROFILE_TOKEN'] = os.getenv('PROFILE_TOKEN')
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    if os.getenv('PROFILE_DIR'):
+        app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR')
+
+    # LLM provider: "groq", or "fake" for offline benchmarks
+    app.config['LLM_PROVIDER'] = os.getenv('LLM_PROVIDER', 'groq')
+
+    # JSON provider: "auto" uses orjson when installed, else the stdlib
+    app.config['JSON_PROVIDER'] = os.getenv('JSON_PROVIDER', 'auto')
+
+    # Response compression (gzip, plus brotli/zstd when installed)
+    app.config['COMPRESS_ENABLED'] = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+
+    # Rate limiting: "memory" (per worker) or "sqlite" (shared by the
+    # workers on one host); LOAD_SHED_QUEUE_MS > 0 sheds requests that
+    # waited longer than that behind the proxy (X-Request-Start)
+    app.config['RATELIMIT_ENABLED'] = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    app.config['RATELIMIT_BACKEND'] = os.getenv('RATELIMIT_BACKEND', 'memory')
+    app.config['RATELIMIT_TRUSTED_PROXIES'] = int(os.getenv('RATELIMIT_TRUSTED_PROXIES', '0'))
+    app.config['LOAD_SHED_QUEUE_MS'] = float(os.getenv('LOAD_SHED_QUEUE_MS', '0'))
+    if os.getenv('RATELIMIT_SQLITE_PATH'):
+        app.config['RATELIMIT_SQLITE_PATH'] = os.getenv('RATELIMIT_SQLITE_PATH')
+
+    # Background tasks: worker threads per process, plus an optional SQLite
+    # journal so durable tasks survive restarts
+    app.config['TASKS_WORKERS'] = int(os.getenv('TASKS_WORKERS', '2'))
+    app.config['TASKS_DURABLE_PATH'] = os.getenv('TASKS_DURABLE_PATH')
+
+    # Chat turns kept per user as LLM context (older ones stay in the DB)
+    app.config['CHAT_CONTEXT_MESSAGES'] = int(os.getenv('CHAT_CONTEXT_MESSAGES', '20'))
+
+    # Prompts carry the last CHAT_RECENT_MESSAGES turns plus the
+    # RETRIEVAL_TOP_K most relevant older exchanges (BM25)
+    app.config['CHAT_RECENT_MESSAGES'] = int(os.getenv('CHAT_RECENT_MESSAGES', '6'))
+    app.config['RETRIEVAL_TOP_K'] = int(os.getenv('RETRIEVAL_TOP_K', '3'))
+    app.config['RETRIEVAL_ENABLED'] = os.getenv('RETRIEVAL_ENABLED', 'true').lower() == 'true'
+
+    # Raw mood entries older than this move to the archive tier when
+    # `flask mood compact` runs (e.g. from a daily cron job)
+    app.config['MOOD_RETENTION_DAYS'] = int(os.getenv('MOOD_RETENTION_DAYS', '365'))
+
+    # Explicit overrides (benchmarks, scripts) win over the environment
+    if config:
+        app.config.update(config)
+
+    # Configure logging before anything else gets a chance to log
+    logging_config.init_app(app)
 
     # Production CORS configuration
     cors_origins = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
@@ -31,9 +120,21 @@ def create_app():
     }})
 
     # Initialize all extensions
+    serialization.init_app(app)
     init_app(app)
+    caching.init_app(app)
+    metrics.init_app(app)
+    ratelimit.init_app(app)
+    profiling.init_app(app)
+    llm.init_app(app)
+    compression.init_app(app)
+    tasks.init_app(app)
+    chat_history.init_app(app)
+    retrieval.init_app(app)
+    retention.init_app(app)
     
     # Register blueprints
+    batch.init_app(app)
     from auth import auth_bp
     from mood import mood_bp
     from chatbot import chatbot_bp
@@ -66,24 +167,11 @@ def create_app():
         return response
 
     @app.route('/api/self_care_tips', methods=['GET'])
+    @caching.cached('private, max-age=3600', per_user=False)
     @login_required
     def get_self_care_tips():
         """Return a list of self-care tips"""
-        tips = [
-            "Try 4-7-8 breathing: Inhale for 4 counts, hold for 7, exhale for 8.",
-            "Take 30 seconds to write down one thing you're grateful for today.",
-            "Stand up and stretch for 2 minutes to boost your mood and energy.",
-            "Focus on your five senses - notice 5 things you can see, 4 you can touch, 3 you can hear, 2 you can smell, and 1 you can taste.",
-            "Speak to yourself today as you would to a good friend.",
-            "Drink a glass of water - dehydration can affect your mood.",
-            "Set a small, achievable goal for today.",
-            "Listen to a song that makes you feel good.",
-            "Text someone you care about.",
-            "Spend 5 minutes in nature or looking out a window."
-        ]
-    
-        # Get a random tip or return all tips
-        return jsonify({"tips": tips})
+        return jsonify({"tips": SELF_CARE_TIPS})
     
     return app
 
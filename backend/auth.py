@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify, session
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, db
+from caching import cached, invalidate_user
+import chat_history
+import retrieval
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -58,10 +61,14 @@ def login():
 @auth_bp.route('/logout', methods=['POST'])
 @login_required
 def logout():
+    invalidate_user(current_user.id)
+    chat_history.contexts.discard(current_user.id)
+    retrieval.indexes.discard(current_user.id)
     logout_user()
     return jsonify({'message': 'Logout successful'})
 
 @auth_bp.route('/me', methods=['GET'])
+@cached('private, no-cache', ttl=3600)
 @login_required
 def get_current_user():
     return jsonify(current_user.to_dict())
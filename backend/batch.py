@@ -0,0 +1,176 @@
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, current_app, g, jsonify, request
+from flask_login import current_user, login_required
+from werkzeug.test import EnvironBuilder
+
+from database import db
+
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+
+# Endpoints that change the session itself can't be batched: their cookie
+# updates would be lost with the sub-response
+EXCLUDED_ENDPOINTS = {'batch.batch', 'auth.login', 'auth.logout', 'auth.register'}
+
+# Request headers a sub-request may set (lowercase); any others are dropped
+SUBREQUEST_HEADERS = {'accept', 'content-type', 'if-none-match', 'if-modified-since'}
+
+# Response headers worth passing back to the client
+FORWARDED_HEADERS = ('ETag', 'Cache-Control', 'Location', 'Retry-After')
+
+# Set in sub-request environs so per-response hooks can tell them apart
+SUBREQUEST_ENVIRON_KEY = 'batch.subrequest'
+
+# One pool per process, created in init_app, so batches reuse its threads
+_executor = None
+
+
+def _validate(subrequests, limit):
+    if not isinstance(subrequests, list) or not subrequests:
+        return 'requests must be a non-empty list'
+    if len(subrequests) > limit:
+        return f'At most {limit} requests can be batched'
+    for sub in subrequests:
+        if not isinstance(sub, dict) or not isinstance(sub.get('path'), str):
+            return 'Each request needs a path'
+        if not sub['path'].startswith('/api/'):
+            return 'Only /api/ paths can be batched'
+        method = sub.get('method', 'GET')
+        if not isinstance(method, str) or method.upper() not in BATCH_METHODS:
+            return f'Unsupported method: {method}'
+        headers = sub.get('headers', {})
+        if not isinstance(headers, dict) or not all(isinstance(value, str) for value in headers.values()):
+            return 'headers must be an object of strings'
+    return None
+
+
+def _request_headers(headers):
+    # Proxy and client-identity headers (X-Forwarded-For, X-Request-Start)
+    # come from the outer request only
+    return {name: value for name, value in headers.items() if name.lower() in SUBREQUEST_HEADERS}
+
+
+def _environ(sub):
+    builder = EnvironBuilder(
+        path=sub['path'],
+        method=sub.get('method', 'GET').upper(),
+        json=sub.get('body'),
+        headers=_request_headers(sub.get('headers', {})),
+        base_url=request.host_url,
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    # Same session cookie, so session-based views see the same user
+    if 'HTTP_COOKIE' in request.environ:
+        environ['HTTP_COOKIE'] = request.environ['HTTP_COOKIE']
+    environ['REMOTE_ADDR'] = request.remote_addr
+    # Sub-responses are embedded as JSON; only the batch response is encoded
+    environ[SUBREQUEST_ENVIRON_KEY] = True
+    return environ
+
+
+def _body(response):
+    if response.is_json:
+        return response.get_json(silent=True)
+    return response.get_data(as_text=True)
+
+
+def _dispatch(app, sub, environ):
+    """Run one sub-request through the normal request pipeline"""
+    with app.request_context(environ):
+        if request.routing_exception is None and request.endpoint in EXCLUDED_ENDPOINTS:
+            status, body, headers = 400, {'message': 'This endpoint cannot be batched'}, {}
+        else:
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                db.session.rollback()
+                status, body, headers = 500, {'message': f'Error: {str(e)}'}, {}
+            else:
+                status, body = response.status_code, _body(response)
+                headers = {name: response.headers[name] for name in FORWARDED_HEADERS if name in response.headers}
+    result = {'status': status, 'body': body, 'headers': headers}
+    if 'id' in sub:
+        result['id'] = sub['id']
+    return result
+
+
+def _dispatch_in_thread(app, sub, environ, user):
+    # A fresh app context gives this thread its own g and DB session; the
+    # parent's user is merged in without a query
+    with app.app_context():
+        g._login_user = db.session.merge(user, load=False)
+        return _dispatch(app, sub, environ)
+
+
+def _groups(subrequests):
+    """Split into runs of consecutive GETs (run concurrently) and single writes"""
+    group = []
+    for sub in subrequests:
+        if sub.get('method', 'GET').upper() == 'GET':
+            group.append(sub)
+            continue
+        if group:
+            yield group
+            group = []
+        yield [sub]
+    if group:
+        yield group
+
+
+@batch_bp.route('', methods=['POST'])
+@login_required
+def batch():
+    """Run several API requests in one round trip.
+
+    Sub-requests run in order inside this request, sharing its authenticated
+    user and database session. Consecutive GETs are independent reads and run
+    concurrently on a shared pool of BATCH_MAX_WORKERS threads; any other
+    method is a barrier.
+    """
+    data = request.get_json(silent=True) or {}
+    subrequests = data.get('requests')
+    error = _validate(subrequests, current_app.config['BATCH_MAX_REQUESTS'])
+    if error:
+        return jsonify({'message': error}), 400
+
+    app = current_app._get_current_object()
+    user = current_user._get_current_object()
+    responses = []
+    for group in _groups(subrequests):
+        environs = [_environ(sub) for sub in group]
+        if len(group) == 1 or _executor is None:
+            responses.extend(_dispatch(app, sub, environ) for sub, environ in zip(group, environs))
+            continue
+        # Touching the user reloads attributes expired by an earlier commit
+        # here, before other threads copy its state
+        user.id
+        responses.extend(_executor.map(
+            lambda item: _dispatch_in_thread(app, item[0], item[1], user), zip(group, environs)))
+
+    return jsonify({'responses': responses})
+
+
+def init_app(app):
+    """Register the /api/batch endpoint"""
+    app.config.setdefault('BATCH_MAX_REQUESTS', 20)
+    app.config.setdefault('BATCH_MAX_WORKERS', 4)
+
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = None
+    if app.config['BATCH_MAX_WORKERS'] > 1:
+        _executor = ThreadPoolExecutor(max_workers=app.config['BATCH_MAX_WORKERS'], thread_name_prefix='batch')
+    app.register_blueprint(batch_bp, url_prefix='/api/batch')
+
+
+@atexit.register
+def _shutdown():
+    if _executor is not None:
+        _executor.shutdown(wait=True)
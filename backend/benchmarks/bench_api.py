@@ -0,0 +1,293 @@
+"""End-to-end load benchmark for the Flask API.
+
+Builds the app from ``create_app()`` against a throwaway SQLite database with
+the fake LLM provider, seeds users and mood histories, then drives a weighted
+mix of realistic requests from several worker processes (like gunicorn
+workers), each running several client threads. No network is used: requests
+go through Flask's test client.
+
+    python benchmarks/bench_api.py --scale medium --workers 2 --concurrency 4 --duration 20
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from common import bench_config, environment, latency_summary, save_results
+
+SCALES = {
+    # users, mood entries per user
+    'small': (10, 50),
+    'medium': (100, 500),
+    'large': (200, 2000),
+}
+
+DEFAULT_MIX = 'login=1,add_mood=3,list_moods=4,insights=3,chat=1,tips=2'
+
+PASSWORD = 'benchmark-password'
+
+NOTES = [
+    'Slept well, good day at work',
+    'Feeling anxious about the exam tomorrow',
+    'Went for a run, felt great afterwards',
+    'Tired and a bit low',
+    'Had a long talk with a friend',
+    '',
+]
+
+CHAT_MESSAGES = [
+    "I'm feeling really anxious about tomorrow.",
+    'Can you suggest a breathing exercise?',
+    "I couldn't sleep last night and I feel exhausted.",
+    'I had a good day today, actually.',
+]
+
+
+def parse_mix(spec):
+    mix = {}
+    for item in spec.split(','):
+        name, weight = item.split('=')
+        if name not in OPERATIONS:
+            raise SystemExit(f'Unknown operation in --mix: {name}')
+        mix[name] = float(weight)
+    return mix
+
+
+def seed(database_uri, users, moods_per_user):
+    """Create ``users`` users with ``moods_per_user`` entries spread over 90 days"""
+    from sqlalchemy import insert, text
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from database import db
+    from models import Mood, User
+
+    app = create_app(bench_config(database_uri))
+    rng = random.Random(42)
+    # Hashing is deliberately slow; every seeded user shares one hash
+    password_hash = generate_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(text('PRAGMA journal_mode=WAL'))
+        db.session.execute(insert(User), [
+            {'username': f'user{i}', 'email': f'user{i}@example.com',
+             'password_hash': password_hash, 'created_at': now}
+            for i in range(users)
+        ])
+        user_ids = [row[0] for row in db.session.execute(db.select(User.id))]
+        for user_id in user_ids:
+            db.session.execute(insert(Mood), [
+                {'user_id': user_id, 'score': rng.randint(1, 10), 'notes': rng.choice(NOTES),
+                 'created_at': now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))}
+                for _ in range(moods_per_user)
+            ])
+        db.session.commit()
+        db.engine.dispose()
+    return len(user_ids)
+
+
+def _login(client, username):
+    return client.post('/api/auth/login', json={'username': username, 'password': PASSWORD})
+
+
+OPERATIONS = {
+    'login': lambda client, user, rng: _login(client, user),
+    'add_mood': lambda client, user, rng: client.post(
+        '/api/mood', json={'score': rng.randint(1, 10), 'notes': rng.choice(NOTES)}),
+    'list_moods': lambda client, user, rng: client.get('/api/mood'),
+    'insights': lambda client, user, rng: client.get('/api/mood/insights'),
+    'chat': lambda client, user, rng: client.post(
+        '/api/chatbot/chat', json={'message': rng.choice(CHAT_MESSAGES)}),
+    'tips': lambda client, user, rng: client.get('/api/self_care_tips'),
+}
+
+
+def _rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return None
+
+
+_thread_stats = threading.local()
+
+
+def _count_queries(conn, cursor, statement, parameters, context, executemany):
+    # The test client runs the app on the calling thread
+    _thread_stats.queries = getattr(_thread_stats, 'queries', 0) + 1
+
+
+def _client_loop(app, username, mix, deadline, seed_value, out):
+    rng = random.Random(seed_value)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    client = app.test_client()
+    _login(client, username)
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        _thread_stats.queries = 0
+        started = time.perf_counter()
+        response = OPERATIONS[name](client, username, rng)
+        elapsed = time.perf_counter() - started
+        out.append((name, elapsed, response.status_code, _thread_stats.queries))
+
+
+def worker(index, args, database_uri, usernames, results):
+    """One process, like a gunicorn worker, running ``concurrency`` client threads"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import create_app
+
+    app = create_app(bench_config(database_uri, LLM_FAKE_LATENCY=args.llm_latency / 1000))
+    event.listen(Engine, 'after_cursor_execute', _count_queries)
+    mix = parse_mix(args.mix)
+    samples = []
+    # Warm up imports, connection pool and templates outside the measurement
+    warmup = app.test_client()
+    _login(warmup, usernames[0])
+    warmup.get('/api/mood')
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = []
+    for t in range(args.concurrency):
+        username = usernames[(index * args.concurrency + t) % len(usernames)]
+        thread = threading.Thread(
+            target=_client_loop,
+            args=(app, username, mix, deadline, index * 1000 + t, samples),
+        )
+        threads.append(thread)
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results.put({
+        'worker': index,
+        'samples': samples,
+        'elapsed': time.perf_counter() - started,
+        'rss_kb': _rss_kb(),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    })
+
+
+def summarize(worker_results, wall_time):
+    by_op = {}
+    for result in worker_results:
+        for name, elapsed, status, queries in result['samples']:
+            op = by_op.setdefault(name, {'latencies': [], 'errors': 0, 'queries': 0})
+            op['latencies'].append(elapsed)
+            op['queries'] += queries
+            if status >= 400:
+                op['errors'] += 1
+
+    operations = {}
+    all_latencies = []
+    total_errors = 0
+    total_queries = 0
+    for name, op in sorted(by_op.items()):
+        summary = latency_summary(op['latencies'])
+        summary['errors'] = op['errors']
+        summary['db_queries_per_request'] = round(op['queries'] / len(op['latencies']), 2)
+        summary['throughput_rps'] = round(len(op['latencies']) / wall_time, 2)
+        operations[name] = summary
+        all_latencies.extend(op['latencies'])
+        total_errors += op['errors']
+        total_queries += op['queries']
+
+    overall = latency_summary(all_latencies)
+    overall['errors'] = total_errors
+    overall['throughput_rps'] = round(len(all_latencies) / wall_time, 2)
+    overall['db_queries_per_request'] = round(total_queries / max(len(all_latencies), 1), 2)
+    return {
+        'overall': overall,
+        'operations': operations,
+        'workers': [
+            {'worker': r['worker'], 'rss_kb': r['rss_kb'], 'max_rss_kb': r['max_rss_kb'],
+             'requests': len(r['samples'])}
+            for r in sorted(worker_results, key=lambda r: r['worker'])
+        ],
+    }
+
+
+def print_report(summary):
+    overall = summary['overall']
+    print(f"\n{'operation':<12} {'count':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'queries':>8} {'errors':>7}")
+    rows = list(summary['operations'].items()) + [('TOTAL', overall)]
+    for name, op in rows:
+        print(f"{name:<12} {op['count']:>7} {op['throughput_rps']:>9} {op['p50_ms']:>9} {op['p95_ms']:>9} "
+              f"{op['p99_ms']:>9} {op['db_queries_per_request']:>8} {op['errors']:>7}")
+    for worker_info in summary['workers']:
+        print(f"worker {worker_info['worker']}: {worker_info['requests']} requests, "
+              f"RSS {worker_info['rss_kb']} kB (peak {worker_info['max_rss_kb']} kB)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--users', type=int, help='override the number of seeded users')
+    parser.add_argument('--moods-per-user', type=int, help='override mood entries per user')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads per worker')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of measured load')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='weighted operation mix, e.g. "%s"' % DEFAULT_MIX)
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='fake LLM latency in ms')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/...)')
+    parser.add_argument('--keep-db', action='store_true', help='keep the seeded database directory')
+    args = parser.parse_args(argv)
+    parse_mix(args.mix)
+
+    users, moods_per_user = SCALES[args.scale]
+    users = args.users or users
+    moods_per_user = args.moods_per_user if args.moods_per_user is not None else moods_per_user
+
+    workdir = tempfile.mkdtemp(prefix='mhb-bench-')
+    database_uri = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    try:
+        started = time.perf_counter()
+        seed(database_uri, users, moods_per_user)
+        print(f'Seeded {users} users x {moods_per_user} moods in {time.perf_counter() - started:.1f}s')
+
+        usernames = [f'user{i}' for i in range(users)]
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        processes = [
+            ctx.Process(target=worker, args=(i, args, database_uri, usernames, results))
+            for i in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        worker_results = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        # Workers measure the same window; startup and warm-up are excluded
+        wall_time = max(r['elapsed'] for r in worker_results)
+    finally:
+        if not args.keep_db:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = summarize(worker_results, wall_time)
+    print_report(summary)
+
+    output = save_results('api', {
+        'benchmark': 'api',
+        'environment': environment(),
+        'parameters': {
+            'scale': args.scale, 'users': users, 'moods_per_user': moods_per_user,
+            'workers': args.workers, 'concurrency': args.concurrency, 'duration': args.duration,
+            'mix': args.mix, 'llm_latency_ms': args.llm_latency,
+        },
+        **summary,
+    }, args.output)
+    print(f'\nResults written to {output}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
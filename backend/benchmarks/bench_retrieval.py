@@ -0,0 +1,150 @@
+"""Microbenchmark: BM25 retrieval over a user's chat history.
+
+Builds a per-user index over synthetic histories of 100-5000 exchanges and
+reports build time, per-exchange insert time and search latency (p50, p95
+and p99 against a 5 ms budget). It also reports the prompt tokens of three
+prompt shapes:
+
+- full: the whole history
+- window: the last CHAT_CONTEXT_MESSAGES turns
+- retrieval: recent turns plus the top-k snippets
+
+    python benchmarks/bench_retrieval.py --exchanges 100 1000 5000
+"""
+import argparse
+import random
+import sys
+import time
+
+from common import environment, latency_summary, save_results
+
+TOPICS = {
+    'sleep': ['sleep', 'insomnia', 'tired', 'night', 'bed', 'nap', 'awake', 'dreams'],
+    'work': ['work', 'deadline', 'boss', 'meeting', 'project', 'overtime', 'colleague', 'job'],
+    'exam': ['exam', 'study', 'grades', 'test', 'revision', 'class', 'teacher', 'homework'],
+    'family': ['family', 'sister', 'mom', 'dad', 'brother', 'dinner', 'visit', 'argument'],
+    'anxiety': ['anxious', 'panic', 'worry', 'heart', 'racing', 'nervous', 'overthinking', 'fear'],
+    'breathing': ['breathing', 'box', 'inhale', 'exhale', 'calm', 'counting', 'slow', 'exercise'],
+    'exercise': ['run', 'walk', 'gym', 'yoga', 'stretch', 'outside', 'bike', 'steps'],
+    'friends': ['friend', 'lonely', 'party', 'text', 'call', 'weekend', 'plans', 'group'],
+}
+FILLER = ['today', 'again', 'lately', 'this week', 'kind of', 'honestly', 'still', 'a lot']
+
+
+def _sentence(rng, topic, words):
+    terms = rng.sample(TOPICS[topic], 3)
+    filler = rng.sample(FILLER, 2)
+    return ' '.join([terms[0], filler[0], terms[1], filler[1], terms[2]] + rng.sample(TOPICS[topic], 2)[:words])
+
+
+def synthetic_history(exchanges, seed=7):
+    """(user text, reply) pairs about a handful of recurring topics"""
+    rng = random.Random(seed)
+    history = []
+    for _ in range(exchanges):
+        topic = rng.choice(list(TOPICS))
+        user_text = f'I keep thinking about {_sentence(rng, topic, 1)}.'
+        reply = (
+            f'It makes sense that {_sentence(rng, topic, 2)} weighs on you. '
+            f'One thing that can help is to notice {_sentence(rng, topic, 2)} and be gentle with yourself. '
+            'Would you like to talk more about it?'
+        )
+        history.append((user_text, reply))
+    return history
+
+
+def _queries(count, seed=11):
+    rng = random.Random(seed)
+    return [f'can we go back to the {" ".join(rng.sample(TOPICS[rng.choice(list(TOPICS))], 2))} thing?'
+            for _ in range(count)]
+
+
+def _as_messages(history):
+    messages = []
+    for user_text, reply in history:
+        messages.append({'role': 'user', 'content': user_text})
+        messages.append({'role': 'assistant', 'content': reply})
+    return messages
+
+
+def run(exchanges, queries, top_k, recent, window):
+    import retrieval
+    from chatbot import system_prompt
+    from llm import FakeLLM
+
+    history = synthetic_history(exchanges)
+    index = retrieval.UserIndex(max_docs=max(exchanges, 1))
+
+    started = time.perf_counter()
+    for user_text, reply in history[:-1]:
+        index.add(user_text, reply)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    index.add(*history[-1])
+    insert_ms = (time.perf_counter() - started) * 1000
+
+    messages = _as_messages(history)
+    recent_messages = messages[-recent:]
+    exclude = {m['content'] for m in recent_messages if m['role'] == 'user'}
+
+    latencies = []
+    tokens = {'full': [], 'window': [], 'retrieval': []}
+    for query in queries:
+        started = time.perf_counter()
+        results = index.search(query, top_k, exclude)
+        latencies.append(time.perf_counter() - started)
+
+        prompt = [system_prompt['content'], query]
+        snippets = [retrieval.format_snippets(results)] if results else []
+        tokens['full'].append(sum(FakeLLM.count_tokens(text) for text in prompt + [m['content'] for m in messages]))
+        tokens['window'].append(sum(FakeLLM.count_tokens(text) for text in prompt + [m['content'] for m in messages[-window:]]))
+        tokens['retrieval'].append(sum(FakeLLM.count_tokens(text) for text in prompt + snippets + [m['content'] for m in recent_messages]))
+
+    return {
+        'build_ms': round(build_ms, 2),
+        'insert_ms': round(insert_ms, 4),
+        'search': latency_summary(latencies),
+        'prompt_tokens': {name: round(sum(values) / len(values), 1) for name, values in tokens.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exchanges', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--recent', type=int, default=6, help='recent messages sent verbatim')
+    parser.add_argument('--window', type=int, default=20, help='messages in the truncated-history baseline')
+    parser.add_argument('--budget-ms', type=float, default=5.0, help='p95 search latency budget')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/...)')
+    args = parser.parse_args(argv)
+
+    queries = _queries(args.queries)
+    all_results = {}
+    within_budget = True
+    print(f"{'exchanges':>9} {'build ms':>9} {'insert ms':>9} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}"
+          f" {'full tok':>9} {'window tok':>10} {'rag tok':>8} {'saved':>6}")
+    for exchanges in args.exchanges:
+        result = run(exchanges, queries, args.top_k, args.recent, args.window)
+        all_results[str(exchanges)] = result
+        search, tokens = result['search'], result['prompt_tokens']
+        within_budget = within_budget and search['p95_ms'] <= args.budget_ms
+        saved = 1 - tokens['retrieval'] / tokens['full']
+        print(f"{exchanges:>9} {result['build_ms']:>9.1f} {result['insert_ms']:>9.3f} {search['p50_ms']:>7.3f}"
+              f" {search['p95_ms']:>7.3f} {search['p99_ms']:>7.3f} {tokens['full']:>9.0f} {tokens['window']:>10.0f}"
+              f" {tokens['retrieval']:>8.0f} {saved:>6.0%}")
+
+    print(f"\np95 search latency {'within' if within_budget else 'OVER'} the {args.budget_ms} ms budget")
+    output = save_results('retrieval', {
+        'benchmark': 'retrieval',
+        'environment': environment(),
+        'parameters': vars(args),
+        'results': all_results,
+    }, args.output)
+    print(f'Results written to {output}')
+    return 0 if within_budget else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
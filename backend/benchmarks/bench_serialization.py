@@ -0,0 +1,118 @@
+"""Microbenchmark: serializing a user's mood list at 10k-100k rows.
+
+Compares the old path (ORM instances -> to_dict -> jsonify) with the
+stdlib and orjson providers, and the row path (select columns ->
+serialization.dump_rows) with and without orjson.
+
+    python benchmarks/bench_serialization.py --rows 10000 50000 100000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import bench_config, environment, save_results
+
+
+def _seed(db, Mood, User, rows):
+    from sqlalchemy import insert
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [{
+        'username': 'bench', 'email': 'bench@example.com', 'password_hash': 'x', 'created_at': now,
+    }])
+    user_id = db.session.execute(db.select(User.id)).scalar_one()
+    db.session.execute(insert(Mood), [
+        {'user_id': user_id, 'score': rng.randint(1, 10), 'notes': 'Went for a walk and felt calmer',
+         'created_at': now - timedelta(minutes=i)}
+        for i in range(rows)
+    ])
+    db.session.commit()
+    return user_id
+
+
+def _best_of(fn, repeat):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2), size
+
+
+def run(rows, repeat):
+    from flask.json.provider import DefaultJSONProvider
+    import serialization
+    from app import create_app
+    from database import db
+    from models import Mood, User
+
+    app = create_app(bench_config('sqlite://'))
+    results = {}
+    with app.test_request_context():
+        user_id = _seed(db, Mood, User, rows)
+        query = Mood.query.filter_by(user_id=user_id).order_by(Mood.created_at.desc())
+        row_query = db.select(*Mood.json_columns()).filter_by(user_id=user_id).order_by(Mood.created_at.desc())
+        orjson_provider = serialization.OrjsonProvider(app) if serialization.orjson else None
+        stdlib_provider = DefaultJSONProvider(app)
+
+        def orm_path(provider):
+            def fn():
+                db.session.expunge_all()
+                return len(provider.response([mood.to_dict() for mood in query.all()]).get_data())
+            return fn
+
+        def row_path(use_orjson):
+            def fn():
+                saved = serialization.orjson
+                serialization.orjson = saved if use_orjson else None
+                try:
+                    return len(serialization.dump_rows(db.session.execute(row_query)))
+                finally:
+                    serialization.orjson = saved
+            return fn
+
+        cases = {
+            'orm+stdlib': orm_path(stdlib_provider),
+            'rows+stdlib': row_path(False),
+        }
+        if orjson_provider is not None:
+            cases['orm+orjson'] = orm_path(orjson_provider)
+            cases['rows+orjson'] = row_path(True)
+
+        for name, fn in cases.items():
+            ms, size = _best_of(fn, repeat)
+            results[name] = {'ms': ms, 'bytes': size}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the best is reported')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/...)')
+    args = parser.parse_args(argv)
+
+    all_results = {}
+    for rows in args.rows:
+        results = run(rows, args.repeat)
+        all_results[str(rows)] = results
+        baseline = results['orm+stdlib']['ms']
+        print(f'\n{rows} rows')
+        for name, result in results.items():
+            print(f"  {name:<12} {result['ms']:>9.2f} ms  {baseline / result['ms']:>5.2f}x  {result['bytes']} bytes")
+
+    output = save_results('serialization', {
+        'benchmark': 'serialization',
+        'environment': environment(),
+        'parameters': {'rows': args.rows, 'repeat': args.repeat},
+        'results': all_results,
+    }, args.output)
+    print(f'\nResults written to {output}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
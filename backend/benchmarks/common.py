@@ -0,0 +1,84 @@
+"""Shared helpers for the backend benchmarks"""
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def bench_config(database_uri, **overrides):
+    """App config for an offline, quiet benchmark run"""
+    config = {
+        'SECRET_KEY': 'benchmark',
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'LLM_PROVIDER': 'fake',
+        'LOG_LEVEL': 'WARNING',
+        'LOG_SAMPLE_RATE': 0.0,
+        'METRICS_DIR': None,
+        'PROFILING_ENABLED': False,
+        # Every simulated client shares one IP; limits would just cap the load
+        'RATELIMIT_ENABLED': False,
+    }
+    config.update(overrides)
+    return config
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def latency_summary(samples):
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds"""
+    values = sorted(samples)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3),
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment():
+    return {
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': datetime.utcnow().isoformat(),
+    }
+
+
+def save_results(name, results, output=None):
+    """Write results as JSON (default: results/<name>-<rev>-<timestamp>.json)"""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'{name}-{git_revision()}-{stamp}.json')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return output
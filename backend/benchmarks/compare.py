@@ -0,0 +1,56 @@
+"""Diff two benchmark result files, e.g. from two commits.
+
+    python benchmarks/compare.py results/api-abc123-....json results/api-def456-....json
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'db_queries_per_request')
+# Higher is better only for throughput
+HIGHER_IS_BETTER = {'throughput_rps'}
+
+
+def _change(metric, old, new):
+    if old in (None, 0) or new is None:
+        return ''
+    pct = (new - old) / old * 100
+    better = pct > 0 if metric in HIGHER_IS_BETTER else pct < 0
+    marker = '' if abs(pct) < 5 else (' +' if better else ' !')
+    return f'{pct:+.1f}%{marker}'
+
+
+def _rows(results):
+    rows = dict(results.get('operations', {}))
+    if 'overall' in results:
+        rows['TOTAL'] = results['overall']
+    return rows
+
+
+def compare(base, head):
+    base_rows, head_rows = _rows(base), _rows(head)
+    print(f"base: {base['environment']['git_revision']}  head: {head['environment']['git_revision']}")
+    print(f"{'operation':<14} {'metric':<24} {'base':>10} {'head':>10} {'change':>10}")
+    for name in sorted(set(base_rows) | set(head_rows), key=lambda n: (n == 'TOTAL', n)):
+        old, new = base_rows.get(name, {}), head_rows.get(name, {})
+        for metric in METRICS:
+            if metric not in old and metric not in new:
+                continue
+            a, b = old.get(metric), new.get(metric)
+            print(f"{name:<14} {metric:<24} {str(a):>10} {str(b):>10} {_change(metric, a, b):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('head')
+    args = parser.parse_args(argv)
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    compare(base, head)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+import metrics
+from database import session_user_id
+
+
+class _Entry:
+    __slots__ = ('body', 'etag', 'mimetype', 'expires')
+
+    def __init__(self, body, mimetype, expires):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.mimetype = mimetype
+        self.expires = expires
+
+
+class LRUCache:
+    """Thread-safe mapping bounded to ``max_size`` entries, evicting the
+    least recently used one first"""
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate):
+        """Drop the entries whose key matches ``predicate``"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ResponseCache(LRUCache):
+    """In-process LRU of serialized response bodies, keyed per endpoint/user"""
+
+    def get(self, key):
+        entry = super().get(key)
+        if entry is not None and entry.expires is not None and entry.expires < time.monotonic():
+            self.discard(key)
+            return None
+        return entry
+
+    def store(self, key, body, mimetype, ttl=None):
+        return self.set(key, _Entry(body, mimetype, time.monotonic() + ttl if ttl else None))
+
+    def invalidate(self, endpoint=None, user_id=None):
+        """Drop entries matching ``endpoint`` and/or ``user_id`` (all if neither)"""
+        self.discard_where(lambda key: (endpoint is None or key[0] == endpoint)
+                           and (user_id is None or key[1] == user_id))
+
+
+cache = ResponseCache()
+
+
+def invalidate_user(user_id, endpoint=None):
+    """Invalidation hook: forget cached responses for a user"""
+    cache.invalidate(endpoint=endpoint, user_id=user_id)
+
+
+def _cached_response(entry, cache_control, per_user):
+    response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = cache_control
+    if per_user:
+        response.vary.add('Cookie')
+    # Turns into a bodyless 304 when If-None-Match matches the ETag
+    return response.make_conditional(request)
+
+
+def cached(cache_control='private, no-cache', per_user=True, ttl=None):
+    """Serve a GET view from precomputed bodies with a strong ETag.
+
+    Apply it *above* ``login_required``: when the session already carries a
+    user id, cache hits and ``If-None-Match`` revalidations are answered
+    without loading the user or touching the database. Requests without a
+    session user fall through to the wrapped view (and its 401). Only
+    successful, non-streamed responses are cached. Entries live in each
+    worker's memory, so only cache payloads that cannot go stale across
+    workers, or call ``invalidate_user`` wherever they change.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or not current_app.config['RESPONSE_CACHE_ENABLED']:
+                return view(*args, **kwargs)
+            user_id = session_user_id()
+            if user_id is None:
+                return view(*args, **kwargs)
+
+            key = (request.endpoint, user_id if per_user else None, request.query_string)
+            entry = cache.get(key)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = cache.store(key, response.get_data(), response.mimetype, ttl)
+                result = 'miss'
+            else:
+                result = 'hit'
+
+            response = _cached_response(entry, cache_control, per_user)
+            if response.status_code == 304:
+                result = 'not_modified'
+            metrics.inc('response_cache_total', endpoint=request.endpoint, result=result)
+            return response
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    """Configure the response cache"""
+    app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+    app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1000)
+    cache.max_size = app.config['RESPONSE_CACHE_MAX_ENTRIES']
+    cache.clear()
@@ -0,0 +1,285 @@
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, func, insert, or_, update
+
+import metrics
+from caching import LRUCache
+from database import db
+from models import ChatMessage, Conversation
+from tasks import task_queue
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Turns journaled by this worker and not yet saved, by turn key
+_pending = {}
+_pending_lock = threading.Lock()
+
+# Called with a user id when another worker added turns behind a cached
+# context, so caches derived from the same history (the retrieval index)
+# are rebuilt too
+stale_hooks = []
+
+
+class ChatContext:
+    """The recent turns of a user's current conversation, as sent to the LLM.
+
+    ``known_count`` is how many messages of the conversation this worker
+    has seen; a larger stored count means another worker added turns.
+    """
+
+    __slots__ = ('conversation_id', 'messages', 'known_count')
+
+    def __init__(self, conversation_id, messages, max_messages, known_count=0):
+        self.conversation_id = conversation_id
+        self.messages = deque(messages, maxlen=max_messages)
+        self.known_count = known_count
+
+
+# Per-user chat contexts of this worker
+contexts = LRUCache()
+
+
+def _owned_conversation(user_id, conversation_id):
+    return db.session.execute(
+        db.select(Conversation.id).filter_by(id=conversation_id, user_id=user_id)
+    ).scalar()
+
+
+def _stored_count(user_id, conversation_id):
+    """Messages of a conversation in the database or waiting to be saved here"""
+    stored = db.session.execute(
+        db.select(func.count()).select_from(ChatMessage)
+        .filter_by(user_id=user_id, conversation_id=conversation_id)
+    ).scalar()
+    return stored + len(pending_messages(conversation_id))
+
+
+def _hydrate(user_id, conversation_id=None):
+    """Load only the newest turns of a conversation (the latest by default)"""
+    if conversation_id is None:
+        conversation_id = db.session.execute(
+            db.select(Conversation.id).filter_by(user_id=user_id)
+            .order_by(Conversation.updated_at.desc(), Conversation.id.desc()).limit(1)
+        ).scalar()
+    max_messages = current_app.config['CHAT_CONTEXT_MESSAGES']
+    if conversation_id is None:
+        return ChatContext(None, (), max_messages)
+
+    rows = db.session.execute(
+        db.select(ChatMessage.role, ChatMessage.content)
+        .filter_by(user_id=user_id, conversation_id=conversation_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(max_messages)
+    ).all()
+    messages = [{'role': role, 'content': content} for role, content in reversed(rows)]
+    messages.extend(
+        {'role': row['role'], 'content': row['content']}
+        for row in pending_messages(conversation_id)
+    )
+    return ChatContext(conversation_id, messages, max_messages, _stored_count(user_id, conversation_id))
+
+
+def get_context(user_id, conversation_id=None):
+    """Return the user's chat context, hydrating it from the database the
+    first time this worker sees the user (or when switching conversation).
+
+    A cached context is checked against the stored message count (one
+    indexed COUNT) and reloaded when another worker has added turns.
+    Returns None if ``conversation_id`` does not belong to the user.
+    """
+    context = contexts.get(user_id)
+    result = 'hydrated'
+    if context is not None and conversation_id in (None, context.conversation_id):
+        if context.conversation_id is None or \
+                _stored_count(user_id, context.conversation_id) <= context.known_count:
+            metrics.inc('chat_context_total', result='hit')
+            return context
+        conversation_id = context.conversation_id
+        result = 'stale'
+    elif conversation_id is not None and _owned_conversation(user_id, conversation_id) is None:
+        return None
+    context = _hydrate(user_id, conversation_id)
+    contexts.set(user_id, context)
+    if result == 'stale':
+        for hook in stale_hooks:
+            hook(user_id)
+    metrics.inc('chat_context_total', result=result)
+    return context
+
+
+def start_conversation(user_id):
+    """Create a new conversation and make it the user's current context"""
+    now = datetime.utcnow()
+    conversation = Conversation(user_id=user_id, created_at=now, updated_at=now)
+    db.session.add(conversation)
+    db.session.commit()
+    context = ChatContext(conversation.id, (), current_app.config['CHAT_CONTEXT_MESSAGES'])
+    contexts.set(user_id, context)
+    return context
+
+
+def record_turn(user_id, context, user_message, response):
+    """Add a completed exchange to the context and persist it.
+
+    With a durable task journal (TASKS_DURABLE_PATH) the turn is journaled
+    and saved by a ``chat.save`` task, so it survives a worker being killed
+    before the insert; without one it is inserted before returning.
+    """
+    turn = ({'role': 'user', 'content': user_message}, {'role': 'assistant', 'content': response})
+    context.messages.extend(turn)
+    context.known_count += len(turn)
+    now = datetime.utcnow()
+    rows = [
+        {
+            'user_id': user_id,
+            'conversation_id': context.conversation_id,
+            'role': message['role'],
+            'content': message['content'],
+            # Distinct timestamps keep the pair ordered and identifiable
+            'created_at': now + timedelta(microseconds=i),
+        }
+        for i, message in enumerate(turn)
+    ]
+    if task_queue.durable:
+        turn_key = uuid.uuid4().hex
+        with _pending_lock:
+            _pending[turn_key] = rows
+        payload = [dict(row, created_at=row['created_at'].isoformat()) for row in rows]
+        if task_queue.enqueue('chat.save', turn_key, payload):
+            return
+        with _pending_lock:
+            _pending.pop(turn_key, None)
+    _insert(rows)
+
+
+def pending_messages(conversation_id=None, user_id=None):
+    """Turns of a conversation (or user) recorded here but not yet saved"""
+    with _pending_lock:
+        rows = [row for turn in _pending.values() for row in turn]
+    if conversation_id is not None:
+        return [row for row in rows if row['conversation_id'] == conversation_id]
+    return [row for row in rows if row['user_id'] == user_id]
+
+
+def _unsaved(rows):
+    """Drop rows already stored, so replaying a journaled turn is harmless"""
+    stored = set(db.session.execute(
+        db.select(ChatMessage.conversation_id, ChatMessage.role, ChatMessage.created_at)
+        .filter(ChatMessage.user_id.in_({row['user_id'] for row in rows}))
+        .filter(ChatMessage.conversation_id.in_({row['conversation_id'] for row in rows}))
+        .filter(ChatMessage.created_at.in_({row['created_at'] for row in rows}))
+    ).all())
+    return [row for row in rows if (row['conversation_id'], row['role'], row['created_at']) not in stored]
+
+
+def _insert(rows):
+    """Insert chat rows in one statement and bump their conversations"""
+    try:
+        rows = _unsaved(rows)
+        if not rows:
+            return
+        db.session.execute(insert(ChatMessage), rows)
+        latest = {}
+        for row in rows:
+            latest[row['conversation_id']] = max(row['created_at'], latest.get(row['conversation_id'], row['created_at']))
+        for conversation_id, updated_at in latest.items():
+            db.session.execute(
+                update(Conversation).where(Conversation.id == conversation_id).values(updated_at=updated_at)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    metrics.inc('chat_messages_persisted_total', len(rows))
+    metrics.observe('chat_flush_batch_size', len(rows), buckets=BATCH_BUCKETS)
+
+
+@task_queue.task('chat.save', durable=True)
+def save_turns(turn_key, payload):
+    """Insert this turn together with every other turn waiting in this worker.
+
+    Turns recorded while the workers are busy accumulate and go in one
+    statement; at low load a batch is usually the one turn.
+
+    Turns another task already saved are skipped; a turn adopted from a dead
+    worker's journal is only known through ``payload``.
+    """
+    with _pending_lock:
+        batch = dict(_pending)
+        _pending.clear()
+    if turn_key not in batch:
+        batch[turn_key] = [dict(row, created_at=datetime.fromisoformat(row['created_at'])) for row in payload]
+    try:
+        _insert([row for rows in batch.values() for row in rows])
+    except Exception:
+        # Keep them visible until the retry saves them
+        with _pending_lock:
+            for key, rows in batch.items():
+                _pending.setdefault(key, rows)
+        raise
+
+
+def history_page(user_id, conversation_id, limit, before=None):
+    """Newest ``limit`` messages older than the ``before`` cursor, oldest first.
+
+    Returns (messages, cursor for the next older page or None).
+    """
+    unflushed = []
+    if before is None:
+        # Turns this worker has not saved yet are the newest of all
+        unflushed = [
+            {'id': None, 'role': row['role'], 'content': row['content'], 'created_at': row['created_at']}
+            for row in pending_messages(conversation_id)
+        ][-limit:]
+    db_limit = limit - len(unflushed)
+
+    query = (
+        db.select(ChatMessage.id, ChatMessage.role, ChatMessage.content, ChatMessage.created_at)
+        .filter_by(user_id=user_id, conversation_id=conversation_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(db_limit + 1)
+    )
+    if before is not None:
+        created_at, message_id = before
+        query = query.where(or_(
+            ChatMessage.created_at < created_at,
+            and_(ChatMessage.created_at == created_at, ChatMessage.id < message_id),
+        ))
+    rows = db.session.execute(query).all()
+    more = len(rows) > db_limit
+    rows = rows[:db_limit]
+
+    messages = [
+        {'id': row.id, 'role': row.role, 'content': row.content, 'created_at': row.created_at}
+        for row in reversed(rows)
+    ] + unflushed
+    cursor = None
+    if more:
+        oldest = messages[0]
+        cursor = f"{oldest['created_at'].isoformat()}_{oldest['id'] or 0}"
+    for message in messages:
+        message['created_at'] = message['created_at'].isoformat()
+    return messages, cursor
+
+
+def parse_cursor(value):
+    """Parse a ``before`` cursor from ``history_page``; None if malformed"""
+    created_at, _, message_id = value.rpartition('_')
+    try:
+        return datetime.fromisoformat(created_at), int(message_id)
+    except ValueError:
+        return None
+
+
+def init_app(app):
+    """Configure per-user chat contexts"""
+    app.config.setdefault('CHAT_CONTEXT_MESSAGES', 20)
+    app.config.setdefault('CHAT_CONTEXT_MAX_USERS', 1000)
+    app.config.setdefault('CHAT_HISTORY_PAGE_SIZE', 50)
+    app.config.setdefault('CHAT_HISTORY_MAX_PAGE_SIZE', 200)
+    contexts.max_size = app.config['CHAT_CONTEXT_MAX_USERS']
+    contexts.clear()
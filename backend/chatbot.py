@@ -1,16 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_login import login_required, current_user
-from groq import Groq
-import os
-from dotenv import load_dotenv
+from llm import MODEL, create_completion
+from models import Conversation, db
+import chat_history
+import retrieval
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
-# Initialize Groq client
-load_dotenv()
-groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'), )
-MODEL = "llama3-70b-8192"  # Using Llama 3 70B model
-
 system_prompt = {
     "role": "system",
     "content":
@@ -71,8 +67,6 @@ system_prompt = {
         """
 }
 
-history = [system_prompt]
-
 
 @chatbot_bp.route('/chat', methods=['POST'])
 @login_required
@@ -83,16 +77,39 @@ def chat():
     if not message:
         return jsonify({'message': 'Message is required'}), 400
     
+    # Recent turns of the user's conversation, loaded lazily after a restart
+    context = chat_history.get_context(current_user.id, data.get('conversation_id'))
+    if context is None:
+        return jsonify({'message': 'Conversation not found'}), 404
+    if context.conversation_id is None:
+        context = chat_history.start_conversation(current_user.id)
+    
     try:
-        # Append user message to history
-        history.append({
+        # Only the latest turns plus the most relevant older exchanges go to
+        # the model, rather than the whole history
+        history = list(context.messages)
+        recent_count = current_app.config['CHAT_RECENT_MESSAGES']
+        # 0 means retrieval-only prompts (and history[-0:] would be everything)
+        recent = history[max(len(history) - recent_count, 0):] if recent_count else []
+        messages = [system_prompt]
+        if current_app.config['RETRIEVAL_ENABLED']:
+            exclude = {turn['content'] for turn in recent if turn['role'] == 'user'}
+            snippets = retrieval.search(current_user.id, message, exclude)
+            if snippets:
+                messages.append({
+                    'role': 'system',
+                    'content': retrieval.format_snippets(snippets, current_app.config['RETRIEVAL_SNIPPET_CHARS'])
+                })
+        else:
+            recent = history
+        messages += [*recent, {
             'role': 'user',
             'content': message
-        })
+        }]
 
         # Call Groq API
-        chat_completion = groq_client.chat.completions.create(
-            messages=history,
+        chat_completion = create_completion(
+            messages=messages,
             model=MODEL,
             temperature=1.2,
             max_tokens=1000,
@@ -101,14 +118,55 @@ def chat():
         # Extract response
         response = chat_completion.choices[0].message.content
         
-        history.append({
-            'role': 'assistant',
-            'content': response
-        })
+        # Journaled and saved by a background task, or inserted right away
+        # without a durable task journal
+        chat_history.record_turn(current_user.id, context, message, response)
+        retrieval.add_exchange(current_user.id, message, response)
         
         return jsonify({
-            'response': response
+            'response': response,
+            'conversation_id': context.conversation_id
         })
     
     except Exception as e:
-        return jsonify({'message': f'Error: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'message': f'Error: {str(e)}'}), 500
+
+
+@chatbot_bp.route('/conversations', methods=['GET'])
+@login_required
+def get_conversations():
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, current_app.config['CHAT_HISTORY_MAX_PAGE_SIZE']))
+    conversations = Conversation.query.filter_by(user_id=current_user.id).order_by(
+        Conversation.updated_at.desc(), Conversation.id.desc()
+    ).limit(limit).all()
+    return jsonify([conversation.to_dict() for conversation in conversations])
+
+
+@chatbot_bp.route('/conversations', methods=['POST'])
+@login_required
+def create_conversation():
+    context = chat_history.start_conversation(current_user.id)
+    return jsonify(db.session.get(Conversation, context.conversation_id).to_dict()), 201
+
+
+@chatbot_bp.route('/conversations/<int:conversation_id>/messages', methods=['GET'])
+@login_required
+def get_messages(conversation_id):
+    conversation = Conversation.query.filter_by(id=conversation_id, user_id=current_user.id).first()
+    if conversation is None:
+        return jsonify({'message': 'Conversation not found'}), 404
+    
+    limit = request.args.get('limit', current_app.config['CHAT_HISTORY_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['CHAT_HISTORY_MAX_PAGE_SIZE']))
+    before = request.args.get('before')
+    if before is not None:
+        before = chat_history.parse_cursor(before)
+        if before is None:
+            return jsonify({'message': 'Invalid cursor'}), 400
+    
+    messages, next_before = chat_history.history_page(current_user.id, conversation_id, limit, before)
+    return jsonify({
+        'messages': messages,
+        'next_before': next_before
+    })
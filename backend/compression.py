@@ -0,0 +1,181 @@
+import threading
+import time
+import zlib
+
+from flask import request
+
+import metrics
+from batch import SUBREQUEST_ENVIRON_KEY
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is always available
+    zstandard = None
+
+DEFAULT_MIMETYPES = (
+    'application/json',
+    'application/javascript',
+    'text/plain',
+    'text/html',
+    'text/css',
+    'text/csv',
+    'text/event-stream',
+    'image/svg+xml',
+)
+
+_local = threading.local()
+
+
+def available_encodings():
+    """Supported encodings, most preferred first"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def _zstd_compressor(level):
+    # ZstdCompressor contexts are reusable but not thread-safe: one per thread
+    compressors = getattr(_local, 'zstd', None)
+    if compressors is None:
+        compressors = _local.zstd = {}
+    compressor = compressors.get(level)
+    if compressor is None:
+        compressor = compressors[level] = zstandard.ZstdCompressor(level=level)
+    return compressor
+
+
+def compress(data, encoding, config):
+    """One-shot compression of a complete body"""
+    if encoding == 'zstd':
+        return _zstd_compressor(config['COMPRESS_ZSTD_LEVEL']).compress(data)
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    compressor = zlib.compressobj(config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _stream_compressor(encoding, config):
+    """Return (compress_chunk, finish) callables that flush after every chunk"""
+    if encoding == 'zstd':
+        compressor = _zstd_compressor(config['COMPRESS_ZSTD_LEVEL']).compressobj()
+        return (
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush,
+        )
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['COMPRESS_BROTLI_QUALITY'])
+        return (
+            lambda chunk: compressor.process(chunk) + compressor.flush(),
+            compressor.finish,
+        )
+    compressor = zlib.compressobj(config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+    return (
+        lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def _record(endpoint, encoding, size_in, size_out, seconds):
+    # seconds is this thread's CPU time (time.thread_time), not wall time
+    metrics.inc('compression_bytes_in_total', size_in, endpoint=endpoint, encoding=encoding)
+    metrics.inc('compression_bytes_out_total', size_out, endpoint=endpoint, encoding=encoding)
+    metrics.inc('compression_seconds_total', seconds, endpoint=endpoint, encoding=encoding)
+
+
+def _compress_stream(chunks, encoding, config, endpoint):
+    """Compress a streamed body chunk by chunk, flushing so each chunk
+    (e.g. a server-sent event) reaches the client immediately"""
+    compress_chunk, finish = _stream_compressor(encoding, config)
+    size_in = size_out = 0
+    seconds = 0.0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            started = time.thread_time()
+            out = compress_chunk(chunk)
+            seconds += time.thread_time() - started
+            size_in += len(chunk)
+            size_out += len(out)
+            if out:
+                yield out
+        tail = finish()
+        size_out += len(tail)
+        if tail:
+            yield tail
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        _record(endpoint, encoding, size_in, size_out, seconds)
+
+
+def _should_compress(response, config):
+    if request.method == 'HEAD' or response.direct_passthrough:
+        return False
+    if request.environ.get(SUBREQUEST_ENVIRON_KEY):
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    return response.mimetype in config['COMPRESS_MIMETYPES']
+
+
+def init_app(app):
+    """Compress responses with the best encoding the client accepts.
+
+    Register this after the other after_request hooks (metrics, logging) so
+    it runs before them and compression time is counted in request latency.
+    """
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+    app.config.setdefault('COMPRESS_ZSTD_LEVEL', 3)
+
+    if not app.config['COMPRESS_ENABLED']:
+        return
+
+    config = app.config
+    encodings = available_encodings()
+
+    @app.after_request
+    def _compress_response(response):
+        if not _should_compress(response, config):
+            return response
+        # Shared caches must key on Accept-Encoding even for identity bodies
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding, config, endpoint)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESS_MIN_SIZE']:
+                return response
+            started = time.thread_time()
+            compressed = compress(data, encoding, config)
+            _record(endpoint, encoding, len(data), len(compressed), time.thread_time() - started)
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        # The encoded body is no longer byte-identical to what a strong ETag
+        # promised; conditional requests compare ETags weakly anyway
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
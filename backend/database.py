@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from flask import session
 from flask_login import LoginManager
 
 # Initialize extensions
@@ -20,3 +21,16 @@ def init_app(app):
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
+
+
+def session_user_id():
+    """Id of the logged-in user from the session cookie, without a DB query.
+
+    Returns None when the session has no user (e.g. remember-cookie only
+    logins); callers should then fall back to the normal login_required path.
+    """
+    user_id = session.get('_user_id')
+    try:
+        return int(user_id) if user_id is not None else None
+    except (TypeError, ValueError):
+        return None
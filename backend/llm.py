@@ -0,0 +1,72 @@
+import os
+import time
+from types import SimpleNamespace
+
+from flask import current_app
+
+import metrics
+
+MODEL = "llama3-70b-8192"  # Using Llama 3 70B model
+
+
+class FakeLLM:
+    """Offline stand-in for the Groq client with the same call shape.
+
+    Sleeps for ``latency`` seconds and echoes a canned reply, reporting token
+    usage estimated from word counts so metrics and benchmarks see realistic
+    prompt sizes.
+    """
+
+    reply = (
+        "That sounds like a lot to carry. It's completely okay to feel this way. "
+        "Would it help to try a short breathing exercise together, or would you "
+        "rather talk a bit more about what's been going on?"
+    )
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @staticmethod
+    def count_tokens(text):
+        # Rough approximation: ~0.75 words per token for English text
+        return int(len(text.split()) / 0.75) + 1
+
+    def create(self, messages, model=MODEL, **kwargs):
+        started = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        prompt_tokens = sum(self.count_tokens(m['content']) for m in messages)
+        completion_tokens = self.count_tokens(self.reply)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(role='assistant', content=self.reply))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                completion_time=(time.perf_counter() - started) / 2,
+            ),
+            model=model,
+        )
+
+
+def _create_client(app):
+    provider = app.config['LLM_PROVIDER']
+    if provider == 'fake':
+        return FakeLLM(latency=app.config['LLM_FAKE_LATENCY'])
+    if provider == 'groq':
+        from groq import Groq
+        return Groq(api_key=os.getenv('GROQ_API_KEY'))
+    raise ValueError(f'Unknown LLM_PROVIDER: {provider}')
+
+
+def create_completion(**kwargs):
+    """Call the app's configured LLM provider (instrumented with metrics)"""
+    return current_app.extensions['llm'](**kwargs)
+
+
+def init_app(app):
+    """Create the LLM client selected by LLM_PROVIDER"""
+    app.config.setdefault('LLM_PROVIDER', 'groq')
+    app.config.setdefault('LLM_FAKE_LATENCY', 0.0)
+    client = _create_client(app)
+    app.extensions['llm'] = metrics.instrument_llm(client.chat.completions.create, MODEL)
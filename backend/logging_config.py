@@ -0,0 +1,171 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from flask import has_request_context, request
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+REDACTED = '[REDACTED]'
+
+_listener = None
+_queue_handler = None
+
+access_logger = logging.getLogger('access')
+
+
+def _redact(value, fields):
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if k in fields else _redact(v, fields)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return type(value)(_redact(v, fields) for v in value)
+    return value
+
+
+class RedactionFilter(logging.Filter):
+    """Mask sensitive keys (mood notes, chat content) in log args and extras"""
+
+    def __init__(self, fields):
+        super().__init__()
+        self.fields = frozenset(fields)
+
+    def filter(self, record):
+        if record.args:
+            record.args = _redact(record.args, self.fields)
+        for key, value in list(record.__dict__.items()):
+            if key in _RECORD_ATTRS:
+                continue
+            if key in self.fields:
+                record.__dict__[key] = REDACTED
+            elif isinstance(value, (dict, list, tuple)):
+                record.__dict__[key] = _redact(value, self.fields)
+        return True
+
+
+class RequestSamplingFilter(logging.Filter):
+    """Drop DEBUG records emitted while handling a request that was not sampled"""
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or not has_request_context():
+            return True
+        return request.environ.get('log.sampled', True)
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single JSON line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def _parse_levels(spec):
+    """Parse ``"sqlalchemy.engine=WARNING,werkzeug=INFO"`` into a dict"""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        name, level = item.split('=', 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _stop_listener():
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def configure_logging(config):
+    """Route all logging through a queue to a background JSON writer"""
+    global _listener, _queue_handler
+    _stop_listener()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    # prepare() merges args (and any traceback) into msg on the calling
+    # thread; the listener renders that plus the extras as JSON
+    _queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    _queue_handler.addFilter(RequestSamplingFilter())
+    _queue_handler.addFilter(RedactionFilter(config['LOG_REDACT_FIELDS']))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(config['LOG_LEVEL'])
+
+    for name, level in config['LOG_LEVELS'].items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def init_app(app):
+    """Configure logging once for the app and register request hooks"""
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_LEVELS', {})
+    app.config.setdefault('LOG_SAMPLE_RATE', 0.0)
+    app.config.setdefault('LOG_REDACT_FIELDS', ('notes', 'message', 'content', 'response', 'password'))
+    if isinstance(app.config['LOG_LEVELS'], str):
+        app.config['LOG_LEVELS'] = _parse_levels(app.config['LOG_LEVELS'])
+
+    configure_logging(app.config)
+
+    from flask.logging import default_handler
+    app.logger.removeHandler(default_handler)
+
+    sample_rate = float(app.config['LOG_SAMPLE_RATE'])
+
+    @app.before_request
+    def _start_request_log():
+        request.environ['log.sampled'] = sample_rate >= 1.0 or random.random() < sample_rate
+        request.environ['log.start'] = time.perf_counter()
+
+    @app.after_request
+    def _log_request(response):
+        start = request.environ.get('log.start')
+        if start is None:
+            return response
+        level = logging.WARNING if response.status_code >= 500 else logging.DEBUG
+        if access_logger.isEnabledFor(level):
+            access_logger.log(level, '%s %s %s', request.method, request.path, response.status_code, extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+            })
+        return response
+
+
+atexit.register(_stop_listener)
@@ -0,0 +1,391 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+
+from flask import Blueprint, Response, current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+metrics_bp = Blueprint('metrics', __name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_HELP = {
+    'http_requests_total': ('counter', 'Requests handled, by endpoint, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint'),
+    'db_queries_per_request': ('histogram', 'SQL statements executed per request'),
+    'db_time_per_request_seconds': ('histogram', 'Time spent in SQL per request'),
+    'llm_request_duration_seconds': ('histogram', 'LLM completion latency'),
+    'llm_time_to_first_token_seconds': ('histogram', 'LLM latency until the first generated token'),
+    'llm_prompt_tokens_total': ('counter', 'Prompt tokens sent to the LLM'),
+    'llm_completion_tokens_total': ('counter', 'Completion tokens received from the LLM'),
+    'llm_errors_total': ('counter', 'Failed LLM calls'),
+    'compression_bytes_in_total': ('counter', 'Response bytes before compression'),
+    'compression_bytes_out_total': ('counter', 'Response bytes after compression'),
+    'compression_seconds_total': ('counter', 'CPU time spent compressing responses'),
+    'ratelimit_rejected_total': ('counter', 'Requests rejected with 429, by rate limit rule'),
+    'load_shed_total': ('counter', 'Requests shed with 503 because they queued too long'),
+    'request_queue_seconds': ('histogram', 'Time between the proxy receiving a request and a worker starting it'),
+    'tasks_queued': ('gauge', 'Background tasks waiting to run'),
+    'tasks_total': ('counter', 'Background tasks by task name and outcome'),
+    'task_wait_seconds': ('histogram', 'Time background tasks waited in the queue'),
+    'task_duration_seconds': ('histogram', 'Background task run time'),
+    'chat_context_total': ('counter', 'Chat context lookups by result (hit, hydrated or stale and reloaded from the database)'),
+    'chat_messages_persisted_total': ('counter', 'Chat messages inserted into chat_message'),
+    'chat_flush_batch_size': ('histogram', 'Chat messages inserted per statement'),
+    'retrieval_seconds': ('histogram', 'BM25 search time over past chat exchanges'),
+    'retrieval_index_build_seconds': ('histogram', 'Time to build a per-user retrieval index from the database'),
+    'response_cache_total': ('counter', 'Cached GET responses by result (hit, miss, not_modified)'),
+}
+
+# Each thread writes only to its own shard, so the hot path takes no lock;
+# the registry lock is held only when a new thread registers its shard.
+# Shards of threads that have exited are folded into _base, so the registry
+# stays as small as the set of live threads.
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+
+# Gauges are read from callbacks when metrics are collected
+_gauges = {}
+
+_flush_state = {'dir': None, 'interval': 5.0, 'last': 0.0}
+
+
+class _Shard:
+    __slots__ = ('counters', 'histograms', 'thread')
+
+    def __init__(self, thread=None):
+        self.counters = {}
+        self.histograms = {}
+        self.thread = weakref.ref(thread) if thread is not None else None
+
+    def alive(self):
+        thread = self.thread()
+        return thread is not None and thread.is_alive()
+
+
+_base = _Shard()
+
+
+def _merge(counters, histograms, source_counters, source_histograms):
+    for key, value in source_counters.items():
+        counters[key] = counters.get(key, 0) + value
+    for key, (counts, total, count, buckets) in source_histograms.items():
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = [list(counts), total, count, buckets]
+        else:
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+
+
+def _prune_dead_shards():
+    """Fold shards of exited threads into _base; call with _shards_lock held"""
+    live = []
+    for shard in _shards:
+        if shard.alive():
+            live.append(shard)
+        else:
+            # The owning thread is gone, so nothing writes to this shard
+            _merge(_base.counters, _base.histograms, shard.counters, shard.histograms)
+    _shards[:] = live
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = _Shard(threading.current_thread())
+        with _shards_lock:
+            _prune_dead_shards()
+            _shards.append(shard)
+    return shard
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Increment a counter in the calling thread's shard"""
+    counters = _shard().counters
+    key = _key(name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Record ``value`` in a histogram in the calling thread's shard"""
+    histograms = _shard().histograms
+    key = _key(name, labels)
+    hist = histograms.get(key)
+    if hist is None:
+        # [bucket counts..., sum, count] plus the bucket bounds for rendering
+        hist = histograms[key] = [[0] * len(buckets), 0.0, 0, buckets]
+    counts = hist[0]
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            counts[i] += 1
+            break
+    hist[1] += value
+    hist[2] += 1
+
+
+def gauge(name, callback, **labels):
+    """Report ``callback()`` as a gauge; summed across workers"""
+    _gauges[_key(name, labels)] = callback
+
+
+def _gauge_values():
+    return {key: callback() for key, callback in list(_gauges.items())}
+
+
+def snapshot(include_gauges=True):
+    """Merge all thread shards of this process into plain data"""
+    counters = _gauge_values() if include_gauges else {}
+    histograms = {}
+    with _shards_lock:
+        _prune_dead_shards()
+        _merge(counters, histograms, _base.counters, _base.histograms)
+        shards = list(_shards)
+    for shard in shards:
+        _merge(counters, histograms, shard.counters.copy(), shard.histograms.copy())
+    return counters, histograms
+
+
+def _dump(counters, histograms, gauges):
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), hist[0], hist[1], hist[2], list(hist[3])]
+                       for (name, labels), hist in histograms.items()],
+        'gauges': [[name, list(labels), value] for (name, labels), value in gauges.items()],
+    }
+
+
+def _load_into(data, counters, histograms, include_gauges=True):
+    series = data['counters'] + (data.get('gauges', []) if include_gauges else [])
+    for name, labels, value in series:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, counts, total, count, buckets in data['histograms']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = [list(counts), total, count, tuple(buckets)]
+        else:
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+
+
+def _worker_file(directory):
+    return os.path.join(directory, f'metrics-{os.getpid()}.json')
+
+
+def _file_pid(path):
+    try:
+        return int(os.path.basename(path)[len('metrics-'):-len('.json')])
+    except ValueError:
+        return None
+
+
+def pid_alive(pid):
+    """Whether a process with this pid is running on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def flush():
+    """Write this worker's snapshot to the shared metrics directory, if any"""
+    directory = _flush_state['dir']
+    if not directory:
+        return
+    _flush_state['last'] = time.monotonic()
+    path = _worker_file(directory)
+    tmp = f'{path}.{threading.get_ident()}.tmp'
+    counters, histograms = snapshot(include_gauges=False)
+    with open(tmp, 'w') as f:
+        json.dump(_dump(counters, histograms, _gauge_values()), f)
+    os.replace(tmp, path)
+
+
+def collect():
+    """Aggregate metrics across all gunicorn workers (or just this process).
+
+    Files of workers that no longer run are deleted, and gauges are only
+    taken from files flushed recently, since they describe current state.
+    """
+    counters, histograms = snapshot()
+    directory = _flush_state['dir']
+    if not directory:
+        return counters, histograms
+    own = _worker_file(directory)
+    gauge_max_age = max(30.0, 3 * _flush_state['interval'])
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        if path == own:
+            continue
+        pid = _file_pid(path)
+        if pid is None:
+            continue
+        if not pid_alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            age = time.time() - os.path.getmtime(path)
+            with open(path) as f:
+                _load_into(json.load(f), counters, histograms, include_gauges=age <= gauge_max_age)
+        except (OSError, ValueError):
+            continue
+    return counters, histograms
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def render_prometheus(counters, histograms):
+    """Render metrics in the Prometheus text exposition format"""
+    lines = []
+    seen = set()
+
+    def header(name, default_type):
+        if name in seen:
+            return
+        seen.add(name)
+        metric_type, help_text = _HELP.get(name, (default_type, name))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, 'counter')
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    for (name, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+        header(name, 'histogram')
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {count}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+        lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def observe_llm(model, duration, usage=None, error=False):
+    """Record one LLM call; ``usage`` is the provider's token usage object"""
+    if has_request_context():
+        request.environ['metrics.llm_time'] = request.environ.get('metrics.llm_time', 0.0) + duration
+    observe('llm_request_duration_seconds', duration, model=model)
+    if error:
+        inc('llm_errors_total', model=model)
+        return
+    if usage is None:
+        return
+    inc('llm_prompt_tokens_total', getattr(usage, 'prompt_tokens', 0) or 0, model=model)
+    inc('llm_completion_tokens_total', getattr(usage, 'completion_tokens', 0) or 0, model=model)
+    # Non-streaming calls only see the whole response; the first token
+    # arrived once queueing and prompt processing were done, i.e. wall time
+    # minus the time the provider reports for generating the completion.
+    completion_time = getattr(usage, 'completion_time', None)
+    ttft = duration - completion_time if completion_time is not None else duration
+    observe('llm_time_to_first_token_seconds', max(ttft, 0.0), model=model)
+
+
+def instrument_llm(create, model):
+    """Wrap an LLM ``create(**kwargs)`` callable with latency/token metrics"""
+    def wrapper(**kwargs):
+        start = time.perf_counter()
+        try:
+            result = create(**kwargs)
+        except Exception:
+            observe_llm(model, time.perf_counter() - start, error=True)
+            raise
+        observe_llm(model, time.perf_counter() - start, getattr(result, 'usage', None))
+        return result
+    return wrapper
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which a failed statement simply drops
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    if has_request_context():
+        environ = request.environ
+        environ['metrics.db_queries'] = environ.get('metrics.db_queries', 0) + 1
+        environ['metrics.db_time'] = environ.get('metrics.db_time', 0.0) + elapsed
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return {'message': 'Unauthorized'}, 401
+    return Response(render_prometheus(*collect()), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Register request timing hooks and the /api/metrics endpoint"""
+    app.config.setdefault('METRICS_DIR', None)
+    app.config.setdefault('METRICS_FLUSH_INTERVAL', 5.0)
+    app.config.setdefault('METRICS_TOKEN', None)
+
+    directory = app.config['METRICS_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _flush_state['dir'] = directory
+    _flush_state['interval'] = float(app.config['METRICS_FLUSH_INTERVAL'])
+
+    @app.before_request
+    def _start_timer():
+        request.environ['metrics.start'] = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        environ = request.environ
+        start = environ.get('metrics.start')
+        if start is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        observe('http_request_duration_seconds', time.perf_counter() - start,
+                endpoint=endpoint, method=request.method)
+        inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        observe('db_queries_per_request', environ.get('metrics.db_queries', 0),
+                buckets=COUNT_BUCKETS, endpoint=endpoint)
+        observe('db_time_per_request_seconds', environ.get('metrics.db_time', 0.0), endpoint=endpoint)
+
+        if _flush_state['dir'] and time.monotonic() - _flush_state['last'] >= _flush_state['interval']:
+            flush()
+        return response
+
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+
+
+atexit.register(flush)
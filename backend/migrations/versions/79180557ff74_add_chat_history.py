@@ -0,0 +1,60 @@
+"""add chat history
+
+Revision ID: 79180557ff74
+Revises: 
+Create Date: 2026-10-19 14:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '79180557ff74'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Deployments so far created their tables with db.create_all(), which
+    # also creates these on startup, so only create what is missing
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('conversation'):
+        op.create_table('conversation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('conversation', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_conversation_user_id'), ['user_id'], unique=False)
+
+    if not inspector.has_table('chat_message'):
+        op.create_table('chat_message',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('role', sa.String(length=16), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversation.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('chat_message', schema=None) as batch_op:
+            batch_op.create_index('ix_chat_message_user_conversation_created', ['user_id', 'conversation_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chat_message', schema=None) as batch_op:
+        batch_op.drop_index('ix_chat_message_user_conversation_created')
+
+    op.drop_table('chat_message')
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_conversation_user_id'))
+
+    op.drop_table('conversation')
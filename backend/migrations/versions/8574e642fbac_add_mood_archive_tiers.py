@@ -0,0 +1,54 @@
+"""add mood archive tiers
+
+Revision ID: 8574e642fbac
+Revises: 79180557ff74
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8574e642fbac'
+down_revision = '79180557ff74'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() on startup may already have created these
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('mood_archive'):
+        op.create_table('mood_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('score', sa.SmallInteger(), nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('mood_archive', schema=None) as batch_op:
+            batch_op.create_index('ix_mood_archive_user_created', ['user_id', 'created_at'], unique=False)
+
+    if not inspector.has_table('mood_daily'):
+        op.create_table('mood_daily',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('entries', sa.Integer(), nullable=False),
+        sa.Column('score_sum', sa.Integer(), nullable=False),
+        sa.Column('score_min', sa.SmallInteger(), nullable=False),
+        sa.Column('score_max', sa.SmallInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'day')
+        )
+
+
+def downgrade():
+    op.drop_table('mood_daily')
+    with op.batch_alter_table('mood_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_mood_archive_user_created')
+
+    op.drop_table('mood_archive')
@@ -0,0 +1,54 @@
+"""never reuse mood ids
+
+Revision ID: c3f1d2a9b6e4
+Revises: 8574e642fbac
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f1d2a9b6e4'
+down_revision = '8574e642fbac'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Without AUTOINCREMENT SQLite hands out max(id) + 1, so deleting the
+    # newest entries during compaction let new ones take ids already in
+    # mood_archive. Other databases never reuse sequence values.
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+
+    table_sql = bind.execute(sa.text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'mood'"
+    )).scalar()
+    if 'AUTOINCREMENT' not in table_sql.upper():
+        with op.batch_alter_table('mood', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+    # Renumber hot entries that already took an archived id, then start
+    # the sequence past every id either tier has used
+    last_id = bind.execute(sa.text(
+        'SELECT MAX(id) FROM (SELECT id FROM mood UNION ALL SELECT id FROM mood_archive)'
+    )).scalar() or 0
+    clashes = bind.execute(sa.text(
+        'SELECT id FROM mood WHERE id IN (SELECT id FROM mood_archive) ORDER BY id'
+    )).scalars().all()
+    for mood_id in clashes:
+        last_id += 1
+        bind.execute(sa.text('UPDATE mood SET id = :new WHERE id = :old'), {'new': last_id, 'old': mood_id})
+    bind.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = 'mood'"))
+    bind.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('mood', :seq)"), {'seq': last_id})
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('mood', recreate='always'):
+        pass
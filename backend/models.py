@@ -33,11 +33,19 @@ class User(UserMixin, db.Model):
         }
 
 class Mood(db.Model):
+    # Never reuse ids: archived entries keep theirs (see MoodArchive)
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True)
     score = db.Column(db.Integer, nullable=False)  # 1-10 scale
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    @classmethod
+    def json_columns(cls):
+        """Columns of ``to_dict`` in serialized (sorted) key order, for row queries"""
+        return cls.created_at, cls.id, cls.notes, cls.score, cls.user_id
     
     def to_dict(self):
         return {
@@ -47,3 +55,68 @@ class Mood(db.Model):
             'created_at': self.created_at.isoformat(),
             'user_id': self.user_id
         }
+
+class MoodArchive(db.Model):
+    """Mood entries older than the retention horizon, moved out of the hot
+    ``mood`` table by ``flask mood compact`` (see retention.py)"""
+    __tablename__ = 'mood_archive'
+    __table_args__ = (
+        db.Index('ix_mood_archive_user_created', 'user_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # id from mood, never reused there
+    score = db.Column(db.SmallInteger, nullable=False)
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    @classmethod
+    def json_columns(cls):
+        """Same columns as ``Mood.json_columns``, so both tiers can be unioned"""
+        return cls.created_at, cls.id, cls.notes, cls.score, cls.user_id
+
+class MoodDaily(db.Model):
+    """Per-user daily aggregates of archived mood entries, kept for trends"""
+    __tablename__ = 'mood_daily'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    entries = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    score_min = db.Column(db.SmallInteger, nullable=False)
+    score_max = db.Column(db.SmallInteger, nullable=False)
+
+class Conversation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+class ChatMessage(db.Model):
+    __table_args__ = (
+        # Newest-N history pages for one conversation come straight off this index
+        db.Index('ix_chat_message_user_conversation_created', 'user_id', 'conversation_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
+    role = db.Column(db.String(16), nullable=False)  # 'user' or 'assistant'
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'conversation_id': self.conversation_id,
+            'role': self.role,
+            'content': self.content,
+            'created_at': self.created_at.isoformat()
+        }
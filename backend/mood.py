@@ -2,19 +2,20 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from models import Mood
 from database import db
+from serialization import rows_response
+from retention import daily_trend, mood_rows, mood_scores
 from datetime import datetime, timedelta
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
 
 mood_bp = Blueprint('mood', __name__)
 
 @mood_bp.route('/', methods=['POST'], strict_slashes=False)
 @login_required
 def add_mood():
-    logging.debug("POST /api/mood called")
     data = request.get_json()
-    logging.debug(f"Request data: {data}")
+    logger.debug("Adding mood entry", extra={'payload': data})
     
     # Validate mood score
     score = data.get('score')
@@ -41,10 +42,11 @@ def add_mood():
 @login_required
 def get_moods():
     try:
-        # Get all mood entries for the user
-        moods = Mood.query.filter_by(user_id=current_user.id).order_by(Mood.created_at.desc()).all()
+        # Get all mood entries for the user, recent and archived
+        # Serialized straight from the row tuples; no ORM instances needed
+        result = db.session.execute(mood_rows(current_user.id))
         
-        return jsonify([mood.to_dict() for mood in moods])
+        return rows_response(result)
     except Exception as e:
         return jsonify({'message': f'Error: {str(e)}'}), 500
 
@@ -54,16 +56,16 @@ def get_insights():
     try:
         # Get mood entries from the last 30 days
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        moods = Mood.query.filter_by(user_id=current_user.id).filter(Mood.created_at >= thirty_days_ago).all()
+        scores = mood_scores(current_user.id, thirty_days_ago)
         
-        if not moods:
+        if not scores:
             return jsonify({
                 'message': 'Not enough data for insights',
                 'insights': []
             })
         
         # Calculate average mood
-        avg_mood = sum(mood.score for mood in moods) / len(moods)
+        avg_mood = sum(scores) / len(scores)
         
         # Generate insights based on mood patterns
         insights = []
@@ -85,8 +87,7 @@ def get_insights():
             })
         
         # Check for mood variability
-        mood_scores = [mood.score for mood in moods]
-        if len(mood_scores) >= 5 and max(mood_scores) - min(mood_scores) >= 5:
+        if len(scores) >= 5 and max(scores) - min(scores) >= 5:
             insights.append({
                 'type': 'observation',
                 'message': 'Your mood seems to fluctuate significantly. Tracking triggers might help identify patterns.'
@@ -94,8 +95,21 @@ def get_insights():
         
         return jsonify({
             'average_mood': round(avg_mood, 1),
-            'total_entries': len(moods),
+            'total_entries': len(scores),
             'insights': insights
         })
     except Exception as e:
         return jsonify({'message': f'Error: {str(e)}'}), 500
+
+@mood_bp.route('/trends', methods=['GET'])
+@login_required
+def get_trends():
+    try:
+        # Daily averages; archived days come from the precomputed aggregates
+        days = min(max(request.args.get('days', 90, type=int), 1), 3660)
+        since = (datetime.utcnow() - timedelta(days=days - 1)).date()
+        return jsonify({
+            'days': daily_trend(current_user.id, since)
+        })
+    except Exception as e:
+        return jsonify({'message': f'Error: {str(e)}'}), 500
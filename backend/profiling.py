@@ -0,0 +1,194 @@
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, has_request_context, jsonify, request, send_from_directory
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+profiling_bp = Blueprint('profiling', __name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+
+# cProfile hooks the interpreter, so only one request per process is
+# profiled at a time; others run normally rather than waiting.
+_profile_lock = threading.Lock()
+
+_NAME_RE = re.compile(r'^[\w.-]+$')
+
+
+def _authorized():
+    token = current_app.config['PROFILE_TOKEN']
+    supplied = request.headers.get(PROFILE_HEADER, '')
+    return bool(token) and hmac.compare_digest(supplied, token)
+
+
+def _should_profile():
+    if request.blueprint == 'profiling':
+        return False
+    if request.headers.get(PROFILE_HEADER) is not None:
+        return _authorized()
+    rate = current_app.config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'profile.sql' in request.environ:
+        context._profile_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_profile_start', None)
+    if start is not None and has_request_context() and 'profile.sql' in request.environ:
+        request.environ['profile.sql'].append({
+            'statement': statement,
+            'ms': round((time.perf_counter() - start) * 1000, 3),
+        })
+
+
+def _top_functions(profiler, limit=25):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({
+            'function': f'{os.path.basename(filename)}:{line}({func})',
+            'calls': nc,
+            'tottime_ms': round(tt * 1000, 3),
+            'cumtime_ms': round(ct * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+    return rows[:limit]
+
+
+def _prune(directory, keep):
+    """Keep only the newest ``keep`` profiles in the ring buffer"""
+    names = sorted(name[:-len('.json')] for name in os.listdir(directory) if name.endswith('.json'))
+    for name in names[:-max(keep, 1)]:
+        for ext in ('.json', '.pstats'):
+            try:
+                os.remove(os.path.join(directory, name + ext))
+            except FileNotFoundError:
+                pass
+
+
+def _write_profile(profiler, response):
+    environ = request.environ
+    directory = current_app.config['PROFILE_DIR']
+    started = environ['profile.started']
+    endpoint = request.endpoint or 'unmatched'
+    name = '{}-{}-{}'.format(
+        datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'), os.getpid(), re.sub(r'[^\w.-]', '_', endpoint))
+
+    sql = environ.get('profile.sql', [])
+    meta = {
+        'id': name,
+        'endpoint': endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+        'sql_count': len(sql),
+        'sql_ms': round(sum(q['ms'] for q in sql), 3),
+        'llm_ms': round(environ.get('metrics.llm_time', 0.0) * 1000, 3),
+        'sql': sql,
+        'top': _top_functions(profiler),
+        'created_at': datetime.utcnow().isoformat(),
+    }
+
+    profiler.dump_stats(os.path.join(directory, name + '.pstats'))
+    # Metadata is written last; listing only shows profiles that have it
+    with open(os.path.join(directory, name + '.json'), 'w') as f:
+        json.dump(meta, f)
+    _prune(directory, current_app.config['PROFILE_MAX_FILES'])
+    return name
+
+
+def _stop_profiler():
+    profiler = request.environ.pop('profile.profiler', None)
+    if profiler is None:
+        return None
+    profiler.disable()
+    _profile_lock.release()
+    return profiler
+
+
+@profiling_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    if not _authorized():
+        abort(404)
+    directory = current_app.config['PROFILE_DIR']
+    profiles = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta.pop('sql', None)
+        meta.pop('top', None)
+        profiles.append(meta)
+    return jsonify(profiles)
+
+
+@profiling_bp.route('/profiles/<name>', methods=['GET'])
+def get_profile(name):
+    """Return a profile's metadata, or the raw pstats file with ?format=pstats"""
+    if not _authorized() or not _NAME_RE.match(name):
+        abort(404)
+    directory = current_app.config['PROFILE_DIR']
+    if request.args.get('format') == 'pstats':
+        return send_from_directory(directory, name + '.pstats', as_attachment=True)
+    return send_from_directory(directory, name + '.json')
+
+
+def init_app(app):
+    """Enable opt-in per-request profiling when PROFILING_ENABLED is set"""
+    app.config.setdefault('PROFILING_ENABLED', False)
+    app.config.setdefault('PROFILE_TOKEN', None)
+    app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+    app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config.setdefault('PROFILE_MAX_FILES', 50)
+
+    if not app.config['PROFILING_ENABLED']:
+        return
+
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+
+    @app.before_request
+    def _start_profile():
+        if not _should_profile() or not _profile_lock.acquire(blocking=False):
+            return
+        environ = request.environ
+        environ['profile.sql'] = []
+        environ['profile.started'] = time.perf_counter()
+        profiler = environ['profile.profiler'] = cProfile.Profile()
+        profiler.enable()
+
+    @app.after_request
+    def _finish_profile(response):
+        profiler = _stop_profiler()
+        if profiler is not None:
+            try:
+                response.headers['X-Profile-Id'] = _write_profile(profiler, response)
+            except OSError:
+                app.logger.exception('Could not write request profile')
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        # after_request is skipped when the view raises
+        _stop_profiler()
+
+    app.register_blueprint(profiling_bp, url_prefix='/api')
@@ -0,0 +1,235 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify, request
+
+import metrics
+from database import session_user_id
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Applied unless RATELIMITS overrides them. Keys are endpoint names or
+# blueprint names; an endpoint rule wins over its blueprint's rule.
+DEFAULT_LIMITS = {
+    'auth.login': {'limit': '10/minute', 'key': 'ip', 'algorithm': 'sliding_window'},
+    'auth.register': {'limit': '5/minute', 'key': 'ip', 'algorithm': 'sliding_window'},
+    # Only sending messages costs LLM quota; history reads are not limited
+    'chatbot.chat': {'limit': '20/minute', 'key': 'user', 'algorithm': 'token_bucket'},
+}
+
+# Never rate limited or shed, so health checks and scrapes keep working
+EXEMPT_ENDPOINTS = {'health', 'metrics.prometheus_metrics'}
+
+
+def parse_limit(spec):
+    """Parse ``"10/minute"`` into (count, period in seconds)"""
+    count, _, period = spec.partition('/')
+    if period not in PERIODS:
+        raise ValueError(f'Invalid rate limit: {spec}')
+    return int(count), PERIODS[period]
+
+
+def token_bucket(state, now, limit, period):
+    """Bucket of ``limit`` tokens refilled continuously over ``period``.
+
+    State is (tokens, last update). Returns (allowed, new state, retry after).
+    """
+    tokens, last = state if state else (float(limit), now)
+    tokens = min(float(limit), tokens + (now - last) * limit / period)
+    if tokens >= 1:
+        return True, (tokens - 1, now), 0.0
+    return False, (tokens, now), (1 - tokens) * period / limit
+
+
+def sliding_window(state, now, limit, period):
+    """Sliding window counter: the previous window's count is weighted by how
+    much of it still overlaps the sliding window.
+
+    State is (window start, current count, previous count).
+    """
+    window = math.floor(now / period) * period
+    start, current, previous = state if state else (window, 0, 0)
+    if window != start:
+        previous = current if window - start == period else 0
+        start, current = window, 0
+    weight = 1 - (now - start) / period
+    if previous * weight + current < limit:
+        return True, (start, current + 1, previous), 0.0
+    if current >= limit:
+        # Blocked for the rest of this window, then until this window's
+        # count, as the next window's "previous", has decayed below the limit
+        retry_after = start + period - now + period * (1 - limit / current)
+    else:
+        retry_after = (previous * weight + current - limit) / previous * period
+    return False, (start, current, previous), retry_after
+
+
+ALGORITHMS = {
+    'token_bucket': token_bucket,
+    'sliding_window': sliding_window,
+}
+
+
+class MemoryBackend:
+    """Per-process limiter state, bounded LRU, O(1) per hit"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._state = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, algorithm, limit, period):
+        now = time.time()
+        with self._lock:
+            allowed, state, retry_after = algorithm(self._state.get(key), now, limit, period)
+            self._state[key] = state
+            self._state.move_to_end(key)
+            if len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+        return allowed, retry_after
+
+
+class SQLiteBackend:
+    """Limiter state in a SQLite file shared by all gunicorn workers on a host"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._hits = 0
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS ratelimit ('
+                'key TEXT PRIMARY KEY, a REAL, b REAL, c REAL, updated REAL)'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, algorithm, limit, period):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT a, b, c FROM ratelimit WHERE key = ?', (key,)).fetchone()
+            state = tuple(v for v in row if v is not None) if row else None
+            allowed, state, retry_after = algorithm(state, now, limit, period)
+            values = list(state) + [None] * (3 - len(state))
+            conn.execute(
+                'INSERT OR REPLACE INTO ratelimit (key, a, b, c, updated) VALUES (?, ?, ?, ?, ?)',
+                (key, *values, now),
+            )
+            self._hits += 1
+            if self._hits % self.PRUNE_EVERY == 0:
+                conn.execute('DELETE FROM ratelimit WHERE updated < ?', (now - PERIODS['day'],))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+
+def _client_ip():
+    trusted = current_app.config['RATELIMIT_TRUSTED_PROXIES']
+    if trusted and 'X-Forwarded-For' in request.headers:
+        # Each trusted proxy appends the address it received the request from
+        route = request.access_route
+        return route[-trusted] if len(route) >= trusted else route[0]
+    return request.remote_addr
+
+
+def _rule_for(limits):
+    endpoint = request.endpoint
+    if endpoint in limits:
+        return endpoint, limits[endpoint]
+    if request.blueprint in limits:
+        return request.blueprint, limits[request.blueprint]
+    return None, None
+
+
+def _request_start(header):
+    """Parse X-Request-Start (``t=<epoch>`` in s, ms or µs) set by the proxy"""
+    value = header.strip()
+    if value.startswith('t='):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    if started > 1e14:
+        return started / 1e6
+    if started > 1e11:
+        return started / 1e3
+    return started
+
+
+def _reject(status, message, retry_after):
+    response = jsonify({'message': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_app(app):
+    """Register rate limiting and load shedding for configured routes"""
+    app.config.setdefault('RATELIMIT_ENABLED', True)
+    app.config.setdefault('RATELIMIT_BACKEND', 'memory')
+    app.config.setdefault('RATELIMIT_SQLITE_PATH', os.path.join(app.instance_path, 'ratelimit.db'))
+    app.config.setdefault('RATELIMITS', DEFAULT_LIMITS)
+    app.config.setdefault('RATELIMIT_TRUSTED_PROXIES', 0)
+    app.config.setdefault('LOAD_SHED_QUEUE_MS', 0)
+
+    if app.config['RATELIMIT_BACKEND'] == 'sqlite':
+        os.makedirs(os.path.dirname(app.config['RATELIMIT_SQLITE_PATH']), exist_ok=True)
+        backend = SQLiteBackend(app.config['RATELIMIT_SQLITE_PATH'])
+    else:
+        backend = MemoryBackend()
+
+    limits = {}
+    for name, rule in app.config['RATELIMITS'].items():
+        count, period = parse_limit(rule['limit'])
+        limits[name] = {
+            'count': count,
+            'period': period,
+            'key': rule.get('key', 'user'),
+            'algorithm': ALGORITHMS[rule.get('algorithm', 'token_bucket')],
+        }
+    shed_after = app.config['LOAD_SHED_QUEUE_MS'] / 1000
+
+    @app.before_request
+    def _admission_control():
+        if request.endpoint in EXEMPT_ENDPOINTS or request.method == 'OPTIONS':
+            return None
+
+        if shed_after and 'X-Request-Start' in request.headers:
+            started = _request_start(request.headers['X-Request-Start'])
+            if started is not None:
+                queued = time.time() - started
+                metrics.observe('request_queue_seconds', max(queued, 0.0))
+                if queued > shed_after:
+                    metrics.inc('load_shed_total', endpoint=request.endpoint or 'unmatched')
+                    return _reject(503, 'Server is busy. Please try again shortly.', 1)
+
+        if not app.config['RATELIMIT_ENABLED']:
+            return None
+        name, rule = _rule_for(limits)
+        if rule is None:
+            return None
+        user_id = session_user_id() if rule['key'] == 'user' else None
+        client = f'user:{user_id}' if user_id is not None else f'ip:{_client_ip()}'
+        allowed, retry_after = backend.hit(f'{name}:{client}', rule['algorithm'], rule['count'], rule['period'])
+        if not allowed:
+            metrics.inc('ratelimit_rejected_total', rule=name)
+            return _reject(429, 'Too many requests. Please try again later.', retry_after)
+        return None
@@ -0,0 +1,173 @@
+from datetime import date, datetime, time, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, union_all
+
+from database import db
+from models import Mood, MoodArchive, MoodDaily
+
+mood_cli = AppGroup('mood', help='Mood data maintenance.')
+
+
+def retention_cutoff(horizon_days, now=None):
+    """Start of the oldest day kept in the hot table.
+
+    Aligned to midnight so a day is never split across both tiers.
+    """
+    today = (now or datetime.utcnow()).date()
+    return datetime.combine(today - timedelta(days=horizon_days), time.min)
+
+
+def _aggregate(rows):
+    days = {}
+    for row in rows:
+        key = (row.user_id, row.created_at.date())
+        entries, score_sum, score_min, score_max = days.get(key, (0, 0, row.score, row.score))
+        days[key] = (entries + 1, score_sum + row.score, min(score_min, row.score), max(score_max, row.score))
+    return days
+
+
+def _merge_daily(days):
+    """Add a batch's per-day aggregates to mood_daily"""
+    user_ids = {user_id for user_id, _ in days}
+    existing = {
+        (daily.user_id, daily.day): daily
+        for daily in db.session.scalars(
+            db.select(MoodDaily)
+            .filter(MoodDaily.user_id.in_(user_ids))
+            .filter(MoodDaily.day.in_({day for _, day in days}))
+        )
+    }
+    for (user_id, day), (entries, score_sum, score_min, score_max) in days.items():
+        daily = existing.get((user_id, day))
+        if daily is None:
+            db.session.add(MoodDaily(
+                user_id=user_id, day=day, entries=entries,
+                score_sum=score_sum, score_min=score_min, score_max=score_max,
+            ))
+        else:
+            daily.entries += entries
+            daily.score_sum += score_sum
+            daily.score_min = min(daily.score_min, score_min)
+            daily.score_max = max(daily.score_max, score_max)
+
+
+def compact(cutoff, batch_size=1000, user_id=None, progress=None):
+    """Move mood entries created before ``cutoff`` into the archive tier.
+
+    Works in batches of ``batch_size`` rows in id order. Each batch copies
+    its rows to mood_archive, adds them to the daily aggregates and deletes
+    them from mood in one transaction, so an interrupted run leaves no
+    partial batch behind and simply resumes where it stopped when rerun.
+    Returns the number of entries archived.
+    """
+    moved = 0
+    last_id = 0
+    while True:
+        query = (
+            db.select(Mood.id, Mood.user_id, Mood.score, Mood.notes, Mood.created_at)
+            .filter(Mood.created_at < cutoff, Mood.id > last_id)
+            .order_by(Mood.id)
+            .limit(batch_size)
+        )
+        if user_id is not None:
+            query = query.filter(Mood.user_id == user_id)
+        rows = db.session.execute(query).all()
+        if not rows:
+            return moved
+
+        ids = [row.id for row in rows]
+        try:
+            db.session.execute(insert(MoodArchive), [row._asdict() for row in rows])
+            _merge_daily(_aggregate(rows))
+            db.session.execute(delete(Mood).where(Mood.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        moved += len(rows)
+        last_id = ids[-1]
+        if progress is not None:
+            progress(moved)
+
+
+def mood_rows(user_id, since=None):
+    """Select ``Mood.json_columns()`` for a user from both tiers, newest first"""
+    hot = db.select(*Mood.json_columns()).filter(Mood.user_id == user_id)
+    archived = db.select(*MoodArchive.json_columns()).filter(MoodArchive.user_id == user_id)
+    if since is not None:
+        hot = hot.filter(Mood.created_at >= since)
+        archived = archived.filter(MoodArchive.created_at >= since)
+    combined = union_all(hot, archived).subquery()
+    return db.select(*combined.c).order_by(combined.c.created_at.desc())
+
+
+def mood_scores(user_id, since):
+    """Scores of a user's entries since ``since``, from both tiers"""
+    scores = union_all(
+        db.select(Mood.score).filter(Mood.user_id == user_id, Mood.created_at >= since),
+        db.select(MoodArchive.score).filter(MoodArchive.user_id == user_id, MoodArchive.created_at >= since),
+    ).subquery()
+    return db.session.scalars(db.select(scores.c.score)).all()
+
+
+def daily_trend(user_id, since):
+    """Per-day entry count and average/min/max score since ``since`` (a date),
+    from the daily aggregates of archived days plus the hot table"""
+    days = {
+        daily.day: [daily.entries, daily.score_sum, daily.score_min, daily.score_max]
+        for daily in db.session.scalars(
+            db.select(MoodDaily).filter(MoodDaily.user_id == user_id, MoodDaily.day >= since)
+        )
+    }
+    hot_day = func.date(Mood.created_at)
+    hot = db.session.execute(
+        db.select(hot_day, func.count(), func.sum(Mood.score), func.min(Mood.score), func.max(Mood.score))
+        .filter(Mood.user_id == user_id, Mood.created_at >= datetime.combine(since, time.min))
+        .group_by(hot_day)
+    ).all()
+    for day, entries, score_sum, score_min, score_max in hot:
+        # SQLite returns DATE() as text
+        day = date.fromisoformat(day) if isinstance(day, str) else day
+        if day in days:
+            current = days[day]
+            days[day] = [current[0] + entries, current[1] + score_sum,
+                         min(current[2], score_min), max(current[3], score_max)]
+        else:
+            days[day] = [entries, score_sum, score_min, score_max]
+    return [
+        {
+            'day': day.isoformat(),
+            'entries': entries,
+            'average': round(score_sum / entries, 2),
+            'min': score_min,
+            'max': score_max
+        }
+        for day, (entries, score_sum, score_min, score_max) in sorted(days.items())
+    ]
+
+
+@mood_cli.command('compact')
+@click.option('--horizon-days', type=int, default=None,
+              help='Keep this many days of raw entries in the hot table (default: MOOD_RETENTION_DAYS).')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Rows moved per transaction.')
+@click.option('--user-id', type=int, default=None, help='Only compact entries of this user.')
+def compact_command(horizon_days, batch_size, user_id):
+    """Move old mood entries into the archive tier. Safe to interrupt and rerun."""
+    if horizon_days is None:
+        horizon_days = current_app.config['MOOD_RETENTION_DAYS']
+    if horizon_days < 0 or batch_size < 1:
+        raise click.BadParameter('--horizon-days must be >= 0 and --batch-size >= 1')
+    cutoff = retention_cutoff(horizon_days)
+    click.echo(f'Archiving mood entries created before {cutoff.date().isoformat()}')
+    moved = compact(cutoff, batch_size, user_id, progress=lambda count: click.echo(f'  {count} archived'))
+    click.echo(f'Done: {moved} entries archived')
+
+
+def init_app(app):
+    """Register the mood retention CLI"""
+    app.config.setdefault('MOOD_RETENTION_DAYS', 365)
+    app.cli.add_command(mood_cli)
@@ -0,0 +1,209 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from flask import current_app
+
+import chat_history
+import metrics
+from caching import LRUCache
+from database import db
+from models import ChatMessage
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about am an and any are as at be been but by can could did do does doing for from had has
+have having he her here him his how i i'd i'll i'm i've if in into is it it's its just me
+more most my no not now of on or our out over really so some than that the their them then
+there these they this those to too up us very was we were what when where which who why will
+with would you you're your yours
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords"""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class _Doc:
+    __slots__ = ('user_text', 'reply', 'terms', 'length')
+
+    def __init__(self, user_text, reply):
+        self.user_text = user_text
+        self.reply = reply
+        self.terms = Counter(tokenize(f'{user_text} {reply}'))
+        self.length = sum(self.terms.values())
+
+
+class UserIndex:
+    """Incremental inverted index over one user's past exchanges, BM25 scored.
+
+    A document is one exchange (user message and reply). Adding one updates
+    only the postings of its own terms; the oldest documents are dropped
+    beyond ``max_docs``.
+    """
+
+    def __init__(self, max_docs=5000, k1=1.2, b=0.75):
+        self.max_docs = max_docs
+        self.k1 = k1
+        self.b = b
+        self._docs = OrderedDict()
+        self._postings = {}
+        self._lengths = {}
+        self._total_length = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, user_text, reply):
+        doc = _Doc(user_text, reply)
+        with self._lock:
+            doc_id = self._next_id
+            self._next_id += 1
+            self._docs[doc_id] = doc
+            self._lengths[doc_id] = doc.length
+            self._total_length += doc.length
+            for term, tf in doc.terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            while len(self._docs) > self.max_docs:
+                self._remove_oldest()
+
+    def _remove_oldest(self):
+        doc_id, doc = self._docs.popitem(last=False)
+        del self._lengths[doc_id]
+        self._total_length -= doc.length
+        for term in doc.terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query, k=3, exclude=()):
+        """Top ``k`` (score, user_text, reply) matching ``query``, best first.
+
+        Exchanges whose user message is in ``exclude`` (e.g. turns already in
+        the prompt) are skipped.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._docs:
+                return []
+            count = len(self._docs)
+            # Length normalization k1 * (1 - b + b * length / avg_length),
+            # hoisted out of the per-posting loop
+            base = self.k1 * (1 - self.b)
+            scale = self.k1 * self.b * count / self._total_length if self._total_length else 0.0
+            lengths = self._lengths
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                weight = (self.k1 + 1) * math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                get = scores.get
+                for doc_id, tf in postings.items():
+                    scores[doc_id] = get(doc_id, 0.0) + weight * tf / (tf + base + scale * lengths[doc_id])
+            best = heapq.nlargest(k + len(exclude), scores.items(), key=lambda item: item[1])
+            results = []
+            for doc_id, score in best:
+                doc = self._docs[doc_id]
+                if doc.user_text in exclude:
+                    continue
+                results.append((score, doc.user_text, doc.reply))
+                if len(results) == k:
+                    break
+            return results
+
+
+# Per-user indexes of this worker
+indexes = LRUCache()
+
+# A stale context means the stored history changed under this worker;
+# rebuild the index from it on next use
+chat_history.stale_hooks.append(indexes.discard)
+
+
+def pair_exchanges(messages):
+    """Yield (user text, reply) from chronological (conversation, role, content)"""
+    waiting = {}
+    for conversation_id, role, content in messages:
+        if role == 'user':
+            waiting[conversation_id] = content
+        elif role == 'assistant' and conversation_id in waiting:
+            yield waiting.pop(conversation_id), content
+
+
+def _build(user_id):
+    """Index a user's newest stored exchanges, including unsaved ones"""
+    max_docs = current_app.config['RETRIEVAL_MAX_DOCS']
+    rows = db.session.execute(
+        db.select(ChatMessage.conversation_id, ChatMessage.role, ChatMessage.content)
+        .filter_by(user_id=user_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(max_docs * 2)
+    ).all()
+    messages = [tuple(row) for row in reversed(rows)]
+    messages.extend(
+        (row['conversation_id'], row['role'], row['content'])
+        for row in chat_history.pending_messages(user_id=user_id)
+    )
+    index = UserIndex(max_docs)
+    for user_text, reply in pair_exchanges(messages):
+        index.add(user_text, reply)
+    return index
+
+
+def get_index(user_id):
+    """The user's index, built from the database on first use in this worker"""
+    index = indexes.get(user_id)
+    if index is None:
+        started = time.perf_counter()
+        index = _build(user_id)
+        indexes.set(user_id, index)
+        metrics.observe('retrieval_index_build_seconds', time.perf_counter() - started)
+    return index
+
+
+def add_exchange(user_id, user_text, reply):
+    """Index a new exchange if the user's index is loaded (else it is built
+    from the database, which will include this exchange, on next use)"""
+    index = indexes.get(user_id)
+    if index is not None:
+        index.add(user_text, reply)
+
+
+def search(user_id, query, exclude=()):
+    """Top-k past exchanges of the user relevant to ``query``"""
+    index = get_index(user_id)
+    started = time.perf_counter()
+    results = index.search(query, current_app.config['RETRIEVAL_TOP_K'], exclude)
+    metrics.observe('retrieval_seconds', time.perf_counter() - started)
+    return results
+
+
+def format_snippets(results, max_chars=300):
+    """System message presenting retrieved exchanges to the model"""
+    lines = ['Relevant moments from earlier conversations with this user:']
+    for _, user_text, reply in results:
+        if len(reply) > max_chars:
+            reply = reply[:max_chars].rsplit(' ', 1)[0] + '...'
+        lines.append(f'- User said: "{user_text}" You replied: "{reply}"')
+    return '\n'.join(lines)
+
+
+def init_app(app):
+    """Configure retrieval of past exchanges for chat prompts"""
+    app.config.setdefault('RETRIEVAL_ENABLED', True)
+    app.config.setdefault('RETRIEVAL_TOP_K', 3)
+    app.config.setdefault('RETRIEVAL_MAX_DOCS', 5000)
+    app.config.setdefault('RETRIEVAL_MAX_USERS', 1000)
+    app.config.setdefault('RETRIEVAL_SNIPPET_CHARS', 300)
+    app.config.setdefault('CHAT_RECENT_MESSAGES', 6)
+    indexes.max_size = app.config['RETRIEVAL_MAX_USERS']
+    indexes.clear()
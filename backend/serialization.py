@@ -0,0 +1,75 @@
+import json
+from datetime import date, datetime
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speedup, the stdlib provider is used instead
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Output matches the default provider: keys are sorted, and dates go
+    through ``default`` so they are still rendered as HTTP dates.
+    """
+
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._options(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def _isoformat(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dump_rows(result):
+    """Serialize query result rows straight to a JSON array of objects.
+
+    Skips ORM instances and ``to_dict``: each row tuple is zipped with the
+    selected column names, and datetimes are rendered in ISO format. Select
+    the columns in sorted name order to match ``jsonify`` output exactly.
+    """
+    keys = tuple(result.keys())
+    rows = [dict(zip(keys, row)) for row in result]
+    if orjson is not None:
+        return orjson.dumps(rows, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(rows, default=_isoformat, separators=(',', ':')) + '\n').encode()
+
+
+def rows_response(result, status=200):
+    """Build a JSON response from query result rows (see ``dump_rows``)"""
+    return current_app.response_class(dump_rows(result), status=status, mimetype='application/json')
+
+
+def init_app(app):
+    """Select the JSON provider from JSON_PROVIDER ("auto", "orjson", "stdlib")"""
+    app.config.setdefault('JSON_PROVIDER', 'auto')
+    provider = app.config['JSON_PROVIDER']
+    if provider == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_PROVIDER is "orjson" but orjson is not installed')
+    if provider in ('auto', 'orjson') and orjson is not None:
+        app.json = OrjsonProvider(app)
+    else:
+        app.json = DefaultJSONProvider(app)
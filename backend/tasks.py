@@ -0,0 +1,306 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, scoped_session
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _Task:
+    __slots__ = ('name', 'args', 'kwargs', 'dedupe_key', 'attempts', 'enqueued', 'row_id')
+
+    def __init__(self, name, args, kwargs, dedupe_key=None, attempts=0, row_id=None):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.dedupe_key = dedupe_key
+        self.attempts = attempts
+        self.enqueued = time.perf_counter()
+        self.row_id = row_id
+
+
+class _DurableStore:
+    """SQLite journal of durable tasks so they survive a worker restart.
+
+    Rows are owned by the worker process that enqueued them; on startup a
+    worker adopts the rows of processes that are no longer running.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, payload TEXT NOT NULL, '
+            'dedupe_key TEXT, attempts INTEGER NOT NULL DEFAULT 0, owner INTEGER, created REAL)'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Survives a killed worker without an fsync per task; only an OS
+            # crash can lose the latest writes
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, task):
+        payload = json.dumps({'args': task.args, 'kwargs': task.kwargs})
+        cursor = self._connect().execute(
+            'INSERT INTO tasks (name, payload, dedupe_key, attempts, owner, created) VALUES (?, ?, ?, ?, ?, ?)',
+            (task.name, payload, task.dedupe_key, task.attempts, os.getpid(), time.time()),
+        )
+        task.row_id = cursor.lastrowid
+
+    def update_attempts(self, task):
+        self._connect().execute('UPDATE tasks SET attempts = ? WHERE id = ?', (task.attempts, task.row_id))
+
+    def remove(self, task):
+        self._connect().execute('DELETE FROM tasks WHERE id = ?', (task.row_id,))
+
+    def adopt_orphans(self):
+        """Take over tasks left behind by dead workers and return them"""
+        conn = self._connect()
+        me = os.getpid()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            owners = [row[0] for row in conn.execute('SELECT DISTINCT owner FROM tasks WHERE owner != ?', (me,))]
+            for owner in owners:
+                if owner is None or not metrics.pid_alive(owner):
+                    conn.execute('UPDATE tasks SET owner = ? WHERE owner IS ?', (me, owner))
+            rows = conn.execute(
+                'SELECT id, name, payload, dedupe_key, attempts FROM tasks WHERE owner = ? ORDER BY id', (me,)
+            ).fetchall()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        tasks = []
+        for row_id, name, payload, dedupe_key, attempts in rows:
+            data = json.loads(payload)
+            tasks.append(_Task(name, data['args'], data['kwargs'], dedupe_key, attempts, row_id))
+        return tasks
+
+
+class TaskQueue:
+    """Bounded in-process queue of deferred work run by a small thread pool.
+
+    Tasks are registered by name with ``@task_queue.task('name')`` and
+    enqueued with ``enqueue`` (now) or ``enqueue_after_commit`` (once the
+    current DB transaction commits). Tasks run inside an app context.
+    """
+
+    def __init__(self):
+        self._registry = {}
+        self._app = None
+        self._queue = None
+        self._workers = []
+        self._pending_keys = set()
+        self._keys_lock = threading.Lock()
+        self._store = None
+        self._config = {}
+
+    def task(self, name, durable=False):
+        """Register a task function under ``name``"""
+        def decorator(fn):
+            self._registry[name] = (fn, durable)
+            return fn
+        return decorator
+
+    @property
+    def durable(self):
+        """Whether durable tasks are journaled (TASKS_DURABLE_PATH is set)"""
+        return self._store is not None
+
+    @property
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self, app):
+        self.stop()
+        self._app = app
+        self._config = {
+            'max_retries': app.config['TASKS_MAX_RETRIES'],
+            'retry_backoff': app.config['TASKS_RETRY_BACKOFF'],
+            'enqueue_timeout': app.config['TASKS_ENQUEUE_TIMEOUT'],
+        }
+        self._queue = queue.Queue(maxsize=app.config['TASKS_MAX_QUEUE'])
+        self._pending_keys = set()
+        self._store = _DurableStore(app.config['TASKS_DURABLE_PATH']) if app.config['TASKS_DURABLE_PATH'] else None
+        for i in range(app.config['TASKS_WORKERS']):
+            worker = threading.Thread(target=self._run, name=f'task-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        if self._store is not None:
+            for task in self._store.adopt_orphans():
+                self._put(task)
+
+    def stop(self, timeout=None):
+        """Let workers finish queued tasks, then stop them (graceful drain)"""
+        if not self._workers:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            for _ in self._workers:
+                self._queue.put(_STOP, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except queue.Full:
+            pass
+        for worker in self._workers:
+            worker.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if any(worker.is_alive() for worker in self._workers):
+            logger.warning('Task queue drain timed out with %d tasks queued', self.depth)
+        self._workers = []
+
+    def enqueue(self, name, *args, dedupe_key=None, **kwargs):
+        """Queue a task; returns False if an identical dedupe_key is pending"""
+        if name not in self._registry:
+            raise KeyError(f'Unknown task: {name}')
+        if self._queue is None:
+            raise RuntimeError('Task queue is not running; call tasks.init_app(app)')
+        if dedupe_key is not None:
+            with self._keys_lock:
+                if dedupe_key in self._pending_keys:
+                    metrics.inc('tasks_total', task=name, status='deduped')
+                    return False
+                self._pending_keys.add(dedupe_key)
+        task = _Task(name, list(args), kwargs, dedupe_key)
+        if self._store is not None and self._registry[name][1]:
+            self._store.add(task)
+        return self._put(task)
+
+    def enqueue_after_commit(self, session, name, *args, dedupe_key=None, **kwargs):
+        """Queue a task once ``session`` commits; dropped if it rolls back"""
+        if isinstance(session, scoped_session):
+            session = session()
+        if session.get_transaction() is None:
+            # Begin now so a rollback before any statement still drops it
+            session.begin()
+        session.info.setdefault('tasks.after_commit', []).append((name, args, dedupe_key, kwargs))
+
+    def _put(self, task):
+        try:
+            self._queue.put(task, timeout=self._config['enqueue_timeout'])
+        except queue.Full:
+            self._release_key(task)
+            if task.row_id is not None:
+                # Dropped tasks are not replayed later either; callers fall back
+                self._store.remove(task)
+            metrics.inc('tasks_total', task=task.name, status='dropped')
+            logger.error('Task queue full, dropping %s', task.name)
+            return False
+        return True
+
+    def _release_key(self, task):
+        if task.dedupe_key is not None:
+            with self._keys_lock:
+                self._pending_keys.discard(task.dedupe_key)
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                return
+            metrics.observe('task_wait_seconds', time.perf_counter() - task.enqueued, task=task.name)
+            self._execute(task)
+
+    def _execute(self, task):
+        # A new task with the same key may be queued once this one started
+        self._release_key(task)
+        fn, durable = self._registry[task.name]
+        started = time.perf_counter()
+        try:
+            with self._app.app_context():
+                fn(*task.args, **task.kwargs)
+        except Exception:
+            metrics.observe('task_duration_seconds', time.perf_counter() - started, task=task.name)
+            self._retry(task)
+            return
+        metrics.observe('task_duration_seconds', time.perf_counter() - started, task=task.name)
+        metrics.inc('tasks_total', task=task.name, status='ok')
+        if task.row_id is not None:
+            self._store.remove(task)
+
+    def _retry(self, task):
+        task.attempts += 1
+        if task.attempts > self._config['max_retries']:
+            logger.exception('Task %s failed after %d attempts', task.name, task.attempts)
+            metrics.inc('tasks_total', task=task.name, status='failed')
+            if task.row_id is not None:
+                self._store.remove(task)
+            return
+        logger.warning('Task %s failed, retrying (attempt %d)', task.name, task.attempts, exc_info=True)
+        metrics.inc('tasks_total', task=task.name, status='retry')
+        if task.row_id is not None:
+            self._store.update_attempts(task)
+        delay = self._config['retry_backoff'] * 2 ** (task.attempts - 1)
+        timer = threading.Timer(delay, self._requeue, args=(task,))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, task):
+        task.enqueued = time.perf_counter()
+        if not self._workers:
+            # Stopped while the retry was waiting: nothing would run it. A
+            # journaled task keeps its row and is adopted on the next start
+            self._release_key(task)
+            metrics.inc('tasks_total', task=task.name, status='dropped')
+            logger.error('Task queue stopped, dropping retry of %s%s', task.name,
+                         ' (kept in the journal)' if task.row_id is not None else '')
+            return
+        self._put(task)
+
+
+task_queue = TaskQueue()
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_committed(session):
+    for name, args, dedupe_key, kwargs in session.info.pop('tasks.after_commit', ()):
+        task_queue.enqueue(name, *args, dedupe_key=dedupe_key, **kwargs)
+
+
+# Soft rollback also fires when no database transaction had begun yet;
+# savepoint rollbacks keep the outer transaction's tasks
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('tasks.after_commit', None)
+
+
+def init_app(app):
+    """Start the background task workers for this process"""
+    app.config.setdefault('TASKS_WORKERS', 2)
+    app.config.setdefault('TASKS_MAX_QUEUE', 1000)
+    app.config.setdefault('TASKS_MAX_RETRIES', 3)
+    app.config.setdefault('TASKS_RETRY_BACKOFF', 0.5)
+    app.config.setdefault('TASKS_ENQUEUE_TIMEOUT', 0.1)
+    app.config.setdefault('TASKS_DRAIN_TIMEOUT', 10.0)
+    app.config.setdefault('TASKS_DURABLE_PATH', None)
+
+    if app.config['TASKS_DURABLE_PATH']:
+        os.makedirs(os.path.dirname(os.path.abspath(app.config['TASKS_DURABLE_PATH'])), exist_ok=True)
+    task_queue.start(app)
+    metrics.gauge('tasks_queued', lambda: task_queue.depth)
+
+    drain_timeout = app.config['TASKS_DRAIN_TIMEOUT']
+    # gunicorn workers exit through sys.exit on SIGTERM, which runs atexit
+    atexit.unregister(_drain)
+    atexit.register(_drain, drain_timeout)
+
+
+def _drain(timeout):
+    task_queue.stop(timeout)
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from database import db  # noqa: E402
+from models import User  # noqa: E402
+
+
+def make_app(tmp_path, **config):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'LLM_PROVIDER': 'fake',
+        'METRICS_DIR': None,
+        'TASKS_DURABLE_PATH': None,
+        'RATELIMIT_BACKEND': 'memory',
+        **config,
+    })
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='alex', email='alex@example.com')
+    user.password = 'secret'
+    db.session.add(user)
+    db.session.commit()
+    return user
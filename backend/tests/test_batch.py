@@ -0,0 +1,45 @@
+import gzip
+import json
+
+import pytest
+
+from batch import _environ
+
+
+@pytest.fixture
+def client(app, user):
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'alex', 'password': 'secret'})
+    return client
+
+
+def test_subresponses_are_not_compressed(client):
+    response = client.post('/api/batch', json={'requests': [
+        {'path': '/api/self_care_tips', 'headers': {'Accept-Encoding': 'gzip'}},
+    ]}, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    sub = json.loads(gzip.decompress(response.get_data()))['responses'][0]
+    assert sub['status'] == 200
+    assert sub['body']['tips']
+
+
+@pytest.mark.parametrize('sub', [
+    {'path': '/api/mood', 'method': 5},
+    {'path': '/api/mood', 'method': 'PATCH'},
+    {'path': '/api/mood', 'headers': {'Accept': 1}},
+    {'path': '/api/mood', 'headers': ['Accept']},
+])
+def test_invalid_subrequests_are_rejected(client, sub):
+    response = client.post('/api/batch', json={'requests': [sub]})
+    assert response.status_code == 400
+
+
+def test_only_allowlisted_headers_are_forwarded(app):
+    with app.test_request_context('/api/batch', method='POST'):
+        environ = _environ({'path': '/api/mood', 'headers': {
+            'X-Forwarded-For': '10.0.0.1', 'X-Request-Start': 't=1', 'If-None-Match': '"abc"',
+        }})
+    assert environ['HTTP_IF_NONE_MATCH'] == '"abc"'
+    assert 'HTTP_X_FORWARDED_FOR' not in environ
+    assert 'HTTP_X_REQUEST_START' not in environ
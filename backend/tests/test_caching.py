@@ -0,0 +1,29 @@
+from caching import LRUCache, ResponseCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c'), len(cache)) == (1, 3, 2)
+
+
+def test_response_cache_invalidates_by_endpoint_and_user():
+    cache = ResponseCache()
+    for key in [('tips', 1, 'q'), ('tips', 2, 'q'), ('me', 1, 'q')]:
+        cache.store(key, b'{}', 'application/json')
+    cache.invalidate(user_id=1)
+    assert [cache.get(key) is not None for key in [('tips', 1, 'q'), ('tips', 2, 'q'), ('me', 1, 'q')]] == \
+        [False, True, False]
+    cache.invalidate(endpoint='tips')
+    assert len(cache) == 0
+
+
+def test_response_cache_expires_entries():
+    cache = ResponseCache()
+    cache.store(('tips', None, 'q'), b'{}', 'application/json', ttl=-1)
+    assert cache.get(('tips', None, 'q')) is None
+    assert len(cache) == 0
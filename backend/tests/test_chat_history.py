@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import chat_history
+import retrieval
+from database import db
+from models import ChatMessage
+
+
+def test_switching_conversation_keeps_retrieval_index(app, user):
+    first = chat_history.start_conversation(user.id)
+    chat_history.record_turn(user.id, first, 'hello', 'hi')
+    second = chat_history.start_conversation(user.id)
+    index = retrieval.get_index(user.id)
+
+    assert chat_history.get_context(user.id, first.conversation_id).conversation_id == first.conversation_id
+    assert chat_history.get_context(user.id, second.conversation_id).conversation_id == second.conversation_id
+    assert retrieval.indexes.get(user.id) is index
+
+
+def test_turns_added_by_another_worker_reload_context_and_index(app, user):
+    context = chat_history.start_conversation(user.id)
+    chat_history.record_turn(user.id, context, 'hello', 'hi')
+    retrieval.get_index(user.id)
+
+    # Another worker saves a turn of the same conversation
+    now = datetime.utcnow()
+    db.session.add_all([
+        ChatMessage(user_id=user.id, conversation_id=context.conversation_id, role=role, content=content, created_at=now)
+        for role, content in [('user', 'elsewhere'), ('assistant', 'noted')]
+    ])
+    db.session.commit()
+
+    reloaded = chat_history.get_context(user.id)
+    assert [message['content'] for message in reloaded.messages] == ['hello', 'hi', 'elsewhere', 'noted']
+    assert retrieval.indexes.get(user.id) is None
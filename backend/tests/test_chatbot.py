@@ -0,0 +1,45 @@
+import pytest
+
+import chatbot
+
+
+@pytest.fixture
+def client(app, user):
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'alex', 'password': 'secret'})
+    return client
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Messages of every completion request"""
+    sent = []
+    create_completion = chatbot.create_completion
+
+    def record(messages, **kwargs):
+        sent.append(messages)
+        return create_completion(messages=messages, **kwargs)
+
+    monkeypatch.setattr(chatbot, 'create_completion', record)
+    return sent
+
+
+@pytest.mark.parametrize('recent_count, expected_turns', [(0, 0), (2, 2), (20, 6)])
+def test_prompt_carries_chat_recent_messages_turns(app, client, prompts, recent_count, expected_turns):
+    app.config['CHAT_RECENT_MESSAGES'] = recent_count
+    for i in range(4):
+        assert client.post('/api/chatbot/chat', json={'message': f'message {i}'}).status_code == 200
+    prompt = prompts[-1]
+    assert prompt[-1] == {'role': 'user', 'content': 'message 3'}
+    turns = [message for message in prompt[:-1] if message['role'] != 'system']
+    assert len(turns) == expected_turns
+
+
+@pytest.mark.parametrize('limit, expected', [(-1, 1), (0, 1), (2, 2), (10000, 3)])
+def test_conversation_list_limit_is_clamped(app, client, limit, expected):
+    app.config['CHAT_HISTORY_MAX_PAGE_SIZE'] = 3
+    for _ in range(4):
+        client.post('/api/chatbot/conversations')
+    response = client.get(f'/api/chatbot/conversations?limit={limit}')
+    assert response.status_code == 200
+    assert len(response.get_json()) == expected
@@ -0,0 +1,18 @@
+import pytest
+from flask import request
+from sqlalchemy.exc import OperationalError
+
+from database import db
+
+
+def test_failed_statement_leaves_no_state_on_the_pooled_connection(app):
+    with app.test_request_context():
+        # Connection.info belongs to the pooled DBAPI connection
+        info = db.session.connection().info
+        with pytest.raises(OperationalError):
+            db.session.execute(db.text('SELECT * FROM missing_table'))
+        db.session.rollback()
+        assert not info.get('metrics.query_start')
+
+        db.session.execute(db.text('SELECT 1'))
+        assert request.environ['metrics.db_queries'] == 1
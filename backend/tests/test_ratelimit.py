@@ -0,0 +1,80 @@
+import pytest
+
+from conftest import make_app
+from ratelimit import _reject, sliding_window, token_bucket
+
+
+def hits(algorithm, times, limit=2, period=60, state=None):
+    """Run hits at ``times``, returning [(allowed, retry after)] and the final state"""
+    results = []
+    for now in times:
+        allowed, state, retry_after = algorithm(state, now, limit, period)
+        results.append((allowed, retry_after))
+    return results, state
+
+
+def test_token_bucket_retry_after_is_time_to_next_token():
+    results, _ = hits(token_bucket, [1000, 1000, 1000])
+    assert [allowed for allowed, _ in results] == [True, True, False]
+    # 2 tokens per minute: one every 30 s
+    assert results[2][1] == pytest.approx(30)
+
+
+def test_token_bucket_refills_after_retry_after():
+    results, state = hits(token_bucket, [1000, 1000, 1010])
+    assert results[2] == (False, pytest.approx(20))
+    allowed, _, _ = token_bucket(state, 1030, 2, 60)
+    assert allowed
+
+
+def test_token_bucket_refill_is_capped_at_limit():
+    _, state = hits(token_bucket, [1000, 1000])
+    results, _ = hits(token_bucket, [5000, 5000, 5000], state=state)
+    assert [allowed for allowed, _ in results] == [True, True, False]
+
+
+def test_sliding_window_blocks_for_rest_of_window():
+    results, _ = hits(sliding_window, [120, 130, 140])
+    assert [allowed for allowed, _ in results] == [True, True, False]
+    # Full window: wait for it to end (at 180), then no longer
+    assert results[2][1] == pytest.approx(40)
+
+
+def test_sliding_window_rollover_weights_previous_window():
+    # 2 hits in [120, 180); at 195 a quarter of that window has slid out
+    _, state = hits(sliding_window, [120, 130])
+    results, state = hits(sliding_window, [195, 195], state=state)
+    assert results[0] == (True, 0.0)
+    allowed, retry_after = results[1]
+    assert not allowed
+    # 2 * 0.75 + 1 = 2.5 decays to the limit of 2 after 15 s
+    assert retry_after == pytest.approx(15)
+    allowed, _, _ = sliding_window(state, 195 + retry_after + 0.01, 2, 60)
+    assert allowed
+
+
+def test_sliding_window_forgets_windows_older_than_previous():
+    _, state = hits(sliding_window, [120, 130, 140])
+    results, _ = hits(sliding_window, [300, 300], state=state)
+    assert [allowed for allowed, _ in results] == [True, True]
+
+
+@pytest.mark.parametrize('algorithm', ['token_bucket', 'sliding_window'])
+def test_rejection_sets_retry_after_header(tmp_path, algorithm):
+    app = make_app(tmp_path, RATELIMITS={
+        'auth.login': {'limit': '2/minute', 'key': 'ip', 'algorithm': algorithm},
+    })
+    client = app.test_client()
+    responses = [client.post('/api/auth/login', json={'username': 'x', 'password': 'y'}) for _ in range(3)]
+    assert all(response.status_code != 429 for response in responses[:2])
+    assert responses[2].status_code == 429
+    retry_after = int(responses[2].headers['Retry-After'])
+    assert 1 <= retry_after <= 60
+    assert 'Retry-After' not in responses[0].headers
+
+
+@pytest.mark.parametrize('retry_after, header', [(0.0, '1'), (0.1, '1'), (1.0, '1'), (29.2, '30')])
+def test_retry_after_header_is_whole_seconds_rounded_up(app, retry_after, header):
+    with app.test_request_context():
+        response = _reject(429, 'Too many requests.', retry_after)
+    assert response.headers['Retry-After'] == header
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import retention
+from database import db
+from models import Mood, MoodArchive, MoodDaily
+from retention import compact, daily_trend, mood_rows, mood_scores
+
+CUTOFF = datetime(2026, 1, 1)
+
+
+def add_moods(user, *entries):
+    """Insert (score, created_at) entries for ``user``, returning their ids"""
+    moods = [Mood(user_id=user.id, score=score, notes='', created_at=created_at) for score, created_at in entries]
+    db.session.add_all(moods)
+    db.session.commit()
+    return [mood.id for mood in moods]
+
+
+def test_second_compaction_after_newest_entry_was_archived(app, user):
+    # Archiving the newest entry must not free its id for the next insert
+    first = add_moods(user, (4, CUTOFF - timedelta(days=3)), (5, CUTOFF - timedelta(days=2)))
+    assert compact(CUTOFF) == 2
+
+    second = add_moods(user, (6, CUTOFF - timedelta(days=1)))
+    assert second[0] not in first
+    assert compact(CUTOFF) == 1
+
+    ids = [row.id for row in db.session.execute(mood_rows(user.id))]
+    assert sorted(ids) == sorted(first + second)
+    assert db.session.scalar(db.select(db.func.count()).select_from(MoodArchive)) == 3
+
+
+def test_interrupted_compaction_resumes_on_rerun(app, user, monkeypatch):
+    ids = add_moods(user, *[(score, CUTOFF - timedelta(days=10 - score)) for score in range(1, 6)])
+
+    merge_daily = retention._merge_daily
+    calls = []
+
+    def failing_merge(days):
+        calls.append(days)
+        if len(calls) == 2:
+            raise RuntimeError('interrupted')
+        merge_daily(days)
+
+    monkeypatch.setattr(retention, '_merge_daily', failing_merge)
+    with pytest.raises(RuntimeError):
+        compact(CUTOFF, batch_size=2)
+    # The first batch is committed, the failed one rolled back entirely
+    assert sorted(db.session.scalars(db.select(MoodArchive.id))) == ids[:2]
+    assert sorted(db.session.scalars(db.select(Mood.id))) == ids[2:]
+    assert sum(db.session.scalars(db.select(MoodDaily.entries))) == 2
+
+    monkeypatch.setattr(retention, '_merge_daily', merge_daily)
+    assert compact(CUTOFF, batch_size=2) == 3
+    assert sorted(db.session.scalars(db.select(MoodArchive.id))) == ids
+    assert db.session.scalars(db.select(Mood.id)).all() == []
+    assert sum(db.session.scalars(db.select(MoodDaily.entries))) == 5
+
+
+def test_reads_span_both_tiers(app, user):
+    day = timedelta(days=1)
+    archived = add_moods(user, (2, CUTOFF - 2 * day), (4, CUTOFF - 2 * day + timedelta(hours=3)), (9, CUTOFF - day))
+    compact(CUTOFF)
+    hot = add_moods(user, (7, CUTOFF + timedelta(hours=1)), (5, CUTOFF + timedelta(hours=2)))
+
+    rows = db.session.execute(mood_rows(user.id)).all()
+    assert [row.id for row in rows] == hot[::-1] + archived[::-1]
+    assert [row.id for row in db.session.execute(mood_rows(user.id, since=CUTOFF - day))] == \
+        hot[::-1] + archived[2:]
+
+    assert sorted(mood_scores(user.id, CUTOFF - 2 * day)) == [2, 4, 5, 7, 9]
+    assert daily_trend(user.id, (CUTOFF - 2 * day).date()) == [
+        {'day': '2025-12-30', 'entries': 2, 'average': 3.0, 'min': 2, 'max': 4},
+        {'day': '2025-12-31', 'entries': 1, 'average': 9.0, 'min': 9, 'max': 9},
+        {'day': '2026-01-01', 'entries': 2, 'average': 6.0, 'min': 5, 'max': 7},
+    ]
+    assert [entry['day'] for entry in daily_trend(user.id, CUTOFF.date())] == ['2026-01-01']
+
+
+def test_daily_trend_merges_a_day_present_in_both_tiers(app, user):
+    # A cutoff not at midnight leaves part of a day hot; its trend entry
+    # combines the archived aggregate with the hot rows
+    add_moods(user, (3, CUTOFF - timedelta(hours=2)))
+    compact(CUTOFF - timedelta(hours=1))
+    add_moods(user, (8, CUTOFF - timedelta(minutes=30)))
+    assert daily_trend(user.id, (CUTOFF - timedelta(days=1)).date()) == [
+        {'day': '2025-12-31', 'entries': 2, 'average': 5.5, 'min': 3, 'max': 8},
+    ]
@@ -0,0 +1,63 @@
+import threading
+
+import metrics
+from database import db
+from tasks import _Task, task_queue
+
+ran = []
+done = threading.Event()
+
+
+@task_queue.task('tests.record')
+def record(value):
+    ran.append(value)
+    done.set()
+
+
+def run_queued():
+    """Wait for the workers to finish everything queued so far"""
+    task_queue.stop(timeout=5)
+
+
+def test_after_commit_task_is_queued_on_commit(app):
+    ran.clear()
+    done.clear()
+    task_queue.enqueue_after_commit(db.session, 'tests.record', 'committed')
+    assert ran == []
+    db.session.commit()
+    assert done.wait(5)
+    assert ran == ['committed']
+
+
+def test_after_commit_task_is_dropped_on_rollback(app):
+    ran.clear()
+    task_queue.enqueue_after_commit(db.session, 'tests.record', 'rolled back')
+    db.session.rollback()
+    db.session.commit()
+    run_queued()
+    assert ran == []
+
+
+def test_retry_after_stop_is_dropped_and_releases_its_key(app):
+    run_queued()
+    dropped = ('tasks_total', (('status', 'dropped'), ('task', 'tests.record')))
+    before = metrics.snapshot()[0].get(dropped, 0)
+    task = _Task('tests.record', ['late'], {}, dedupe_key='tests.late')
+    task_queue._pending_keys.add(task.dedupe_key)
+
+    # What a retry timer firing after shutdown does
+    task_queue._requeue(task)
+    assert task_queue.depth == 0
+    assert task.dedupe_key not in task_queue._pending_keys
+    assert metrics.snapshot()[0][dropped] == before + 1
+
+
+def test_after_commit_task_is_dropped_when_a_write_rolls_back(app, user):
+    ran.clear()
+    user.username = 'renamed'
+    db.session.flush()
+    task_queue.enqueue_after_commit(db.session, 'tests.record', 'rolled back')
+    db.session.rollback()
+    db.session.commit()
+    run_queued()
+    assert ran == []
@@ -24,7 +24,9 @@ def create_render_yaml():
                     {"key": "PYTHON_VERSION", "value": "3.12"},
                     {"key": "SECRET_KEY", "generateValue": True},
                     {"key": "GROQ_API_KEY", "sync": False},
-                    {"key": "DATABASE_URI", "fromDatabase": {"name": "mental-health-db", "property": "connectionString"}}
+                    {"key": "DATABASE_URI", "fromDatabase": {"name": "mental-health-db", "property": "connectionString"}},
+                    # Render's load balancer adds the client to X-Forwarded-For
+                    {"key": "RATELIMIT_TRUSTED_PROXIES", "value": "1"}
                 ]
             },
             {
@@ -176,6 +178,7 @@ def create_deployment_guide():
 In your backend service, add:
 - SECRET_KEY: (generate a random string)
 - GROQ_API_KEY: (your Groq API key)
+- RATELIMIT_TRUSTED_PROXIES: 1 (Render's load balancer)
 - CORS_ORIGINS: (your frontend URL)
 
 ## Step 4: Deploy Frontend
@@ -6,18 +6,42 @@ const ChatPage = () => {
   const [inputMessage, setInputMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState('');
+  const [conversationId, setConversationId] = useState(null);
   const messagesEndRef = useRef(null);
 
-  // Welcome message
+  // Welcome message, followed by the newest messages of the last conversation
   useEffect(() => {
-    setMessages([
-      {
-        id: 'welcome',
-        text: "Hello! I'm MindBot, your mental health companion. I'm here to listen, support, and chat with you about anything on your mind. How are you feeling today? 💙",
-        isBot: true,
-        timestamp: new Date()
+    const welcome = {
+      id: 'welcome',
+      text: "Hello! I'm MindBot, your mental health companion. I'm here to listen, support, and chat with you about anything on your mind. How are you feeling today? 💙",
+      isBot: true,
+      timestamp: new Date()
+    };
+    setMessages([welcome]);
+
+    const loadHistory = async () => {
+      try {
+        const conversations = await chatbotService.getConversations(1);
+        if (conversations.data.length === 0) return;
+
+        const conversation = conversations.data[0];
+        const history = await chatbotService.getMessages(conversation.id);
+        setConversationId(conversation.id);
+        setMessages([
+          welcome,
+          ...history.data.messages.map((message, index) => ({
+            id: message.id || `pending-${index}`,
+            text: message.content,
+            isBot: message.role === 'assistant',
+            timestamp: new Date(message.created_at + 'Z')
+          }))
+        ]);
+      } catch (err) {
+        console.error('Error loading chat history:', err);
       }
-    ]);
+    };
+
+    loadHistory();
   }, []);
 
   // Auto-scroll to bottom
@@ -47,7 +71,8 @@ const ChatPage = () => {
     setError('');
 
     try {
-      const response = await chatbotService.sendMessage(inputMessage.trim());
+      const response = await chatbotService.sendMessage(inputMessage.trim(), conversationId);
+      setConversationId(response.data.conversation_id);
       
       const botMessage = {
         id: Date.now() + 1,
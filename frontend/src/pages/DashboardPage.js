@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { moodService, selfCareService } from '../services/api';
+import { batchService } from '../services/api';
 
 const DashboardPage = ({ user }) => {
   const [moodCount, setMoodCount] = useState(0);
@@ -14,9 +14,17 @@ const DashboardPage = ({ user }) => {
       try {
         setLoading(true);
         
-        // Fetch mood data
-        const moodsResponse = await moodService.getMoods();
-        const moods = moodsResponse.data;
+        // Fetch mood data and self-care tips in one round trip
+        const batchResponse = await batchService.run([
+          { path: '/api/mood' },
+          { path: '/api/self_care_tips' },
+        ]);
+        const [moodsResult, tipsResult] = batchResponse.data.responses;
+        if (moodsResult.status !== 200 || tipsResult.status !== 200) {
+          throw new Error('Dashboard request failed');
+        }
+
+        const moods = moodsResult.body;
         setMoodCount(moods.length);
         
         if (moods.length > 0) {
@@ -24,9 +32,7 @@ const DashboardPage = ({ user }) => {
           setAverageMood(Math.round((total / moods.length) * 10) / 10);
         }
         
-        // Fetch self-care tips
-        const tipsResponse = await selfCareService.getTips();
-        setSelfCareTips(tipsResponse.data.tips.slice(0, 3)); // Show only 3 tips
+        setSelfCareTips(tipsResult.body.tips.slice(0, 3)); // Show only 3 tips
         
         setError(null);
       } catch (err) {
@@ -40,12 +40,24 @@ export const moodService = {
 
 // Chatbot services
 export const chatbotService = {
-  sendMessage: (message) => 
-    api.post('/chatbot/chat', { message }),
+  sendMessage: (message, conversationId) => 
+    api.post('/chatbot/chat', { message, conversation_id: conversationId }),
+  
+  getConversations: (limit = 20) => 
+    api.get('/chatbot/conversations', { params: { limit } }),
+  
+  getMessages: (conversationId, before) => 
+    api.get(`/chatbot/conversations/${conversationId}/messages`, { params: { before } }),
 };
 
 export const selfCareService = {
   getTips: () => api.get('/self_care_tips'),
 };
 
+// Batch services: run several API requests in one round trip
+export const batchService = {
+  run: (requests) =>
+    api.post('/batch', { requests }),
+};
+
 export default api;